@@ -0,0 +1,238 @@
+"""
+Pipeline benchmark on synthetic data training.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --rows 1000 10000 --attributes 4 8 --cardinality 2 5 --memory
+    python -m benchmarks.run_benchmarks --compare benchmark_results.json --output new_results.json
+
+Every stage of the pipeline (read_data -> convert_data -> prepare_data -> training -> calc_performance ->
+write_charts) is timed separately; results are written as JSON, and can be compared with a previous run.
+The startup time of the command line tool (imports included) is measured as the 'startup' run.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_dataset
+from src import support_functions
+from src import training
+from src.dataset import Dataset
+from src.naive_bayes import CalcNaiveBayes
+from src.candidate_elimination import CalcCandidateElimination
+from src.support_vector import CalcSupportVector
+
+# libraries imported lazily by the pipeline, imported before the first measure
+PIPELINE_LIBRARIES = training.MEMBER_LIBRARIES + ('xlrd', 'xlsxwriter')
+
+# a stage is reported as a regression when it is this many times slower than the compared run
+DEFAULT_THRESHOLD = 1.25
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# startup measures: name, command line arguments, standard input
+STARTUP_COMMANDS = [
+    ('help', ['--help'], b''),
+    ('menu_quit', [], b'q\n'),
+]
+
+
+def run_stage(stages, name, function, *args, memory=False):
+    """
+    Run a single stage and record wall time, CPU time and (if memory) peak of traced memory
+    :param stages: dictionary of results, updated with the stage
+    :param name: stage name
+    :param function: stage function
+    :param args: arguments of function
+    :param memory: True if tracemalloc is running
+    :return: result of function
+    """
+    if memory:
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+
+    result = function(*args)
+
+    stages[name] = {'wall_s': time.perf_counter() - start_wall, 'cpu_s': time.process_time() - start_cpu}
+    if memory:
+        stages[name]['peak_bytes'] = tracemalloc.get_traced_memory()[1] - start_memory
+    return result
+
+
+def train_nb(data, target):
+    nb = CalcNaiveBayes()
+    nb.training(data, target)
+    return nb
+
+
+def train_ce(data, target, max_boundary_size=None):
+    ce = CalcCandidateElimination(data, target, max_boundary_size=max_boundary_size)
+    ce.candidate_elimination()
+    return ce
+
+
+def train_sv(data, target):
+    sv = CalcSupportVector()
+    sv.training(data, target)
+    return sv
+
+
+def benchmark_pipeline(path, workdir, memory=False, ce_max_boundary=None):
+    """
+    :param path: data training file
+    :param workdir: directory for the Excel file of write_charts
+    :param memory: track peak memory of each stage with tracemalloc (slower)
+    :param ce_max_boundary: max size of S and G of Candidate Elimination (beam mode), None for the exact algorithm
+    :return: dictionary stage -> measures
+    """
+    stages = {}
+    training.import_libraries(PIPELINE_LIBRARIES)
+    if memory:
+        tracemalloc.start()
+    try:
+        real_data, header = run_stage(stages, 'read_data', support_functions.read_data, path, memory=memory)
+        binary_data, _ = run_stage(stages, 'convert_data', support_functions.convert_data, real_data,
+                                   memory=memory)
+        data, target = run_stage(stages, 'prepare_data', support_functions.prepare_data, binary_data, header,
+                                 memory=memory)
+        nb = run_stage(stages, 'train_nb', train_nb, data, target, memory=memory)
+        ce = run_stage(stages, 'train_ce', train_ce, data, target, ce_max_boundary, memory=memory)
+        stages['train_ce']['dropped_hypotheses'] = ce.dropped_hypotheses
+        stages['train_ce']['beam_rebuilds'] = ce.beam_rebuilds
+        stages['train_ce']['status'] = ce.status
+        sv = run_stage(stages, 'train_sv', train_sv, data, target, memory=memory)
+        confusion_matrix = run_stage(stages, 'calc_performance', support_functions.calc_performance,
+                                     binary_data, header, nb, ce, sv, memory=memory)
+        run_stage(stages, 'write_charts', support_functions.write_charts,
+                  support_functions.calc_indexes(confusion_matrix), os.path.join(workdir, 'Performance_recap.xls'),
+                  memory=memory)
+        # streaming reader + compact dataset, the path used by the CLI
+        run_stage(stages, 'read_dataset', Dataset.read, path, memory=memory)
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+    stages['total'] = {'wall_s': sum(stage['wall_s'] for stage in stages.values()),
+                       'cpu_s': sum(stage['cpu_s'] for stage in stages.values())}
+    return stages
+
+
+def measure_startup(runs):
+    """
+    Time short runs of ensemble_learning.py in new interpreters, imports included
+    :param runs: number of runs of each command, the fastest one is kept
+    :return: dictionary command name -> measures
+    """
+    stages = {}
+    for name, arguments, stdin in STARTUP_COMMANDS:
+        walls = []
+        cpus = []
+        for _ in range(runs):
+            before = os.times()
+            start = time.perf_counter()
+            subprocess.run([sys.executable, 'ensemble_learning.py'] + arguments, input=stdin, cwd=REPOSITORY_DIR,
+                           stdout=subprocess.DEVNULL, check=True)
+            walls.append(time.perf_counter() - start)
+            after = os.times()
+            cpus.append(after.children_user - before.children_user + after.children_system - before.children_system)
+        stages[name] = {'wall_s': min(walls), 'cpu_s': min(cpus)}
+    return stages
+
+
+def config_key(config):
+    return 'rows={rows},attributes={attributes},cardinality={cardinality},noise={noise}'.format(**config)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous, current, threshold=DEFAULT_THRESHOLD):
+    """
+    :param previous: results of a previous run (as written by main)
+    :param current: results of this run
+    :param threshold: slowdown ratio reported as regression
+    :return: list of (config, stage, previous wall time, current wall time, ratio) that regressed
+    """
+    regressions = []
+    previous_runs = {run['key']: run for run in previous['runs']}
+    for run in current['runs']:
+        old_run = previous_runs.get(run['key'])
+        if old_run is None:
+            continue
+        for stage, measures in run['stages'].items():
+            old_measures = old_run['stages'].get(stage)
+            if old_measures is None or not old_measures['wall_s']:
+                continue
+            ratio = measures['wall_s'] / old_measures['wall_s']
+            print("{:<60} {:<18} {:>9.4f} s -> {:>9.4f} s  x{:.2f}".format(
+                run['key'], stage, old_measures['wall_s'], measures['wall_s'], ratio))
+            if ratio > threshold:
+                regressions.append((run['key'], stage, old_measures['wall_s'], measures['wall_s'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ensemble learning pipeline on synthetic data")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--attributes', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--cardinality', type=int, nargs='+', default=[2, 5])
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--memory', action='store_true', help="track peak memory of each stage (slower)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="results of a previous run to compare with")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--ce-max-boundary', type=int,
+                        help="train Candidate Elimination in beam mode, with S and G of at most this size")
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help="runs of each startup measure, 0 to skip it")
+    args = parser.parse_args(argv)
+
+    results = {'revision': git_revision(), 'python': platform.python_version(),
+               'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'memory': args.memory, 'runs': []}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows, attributes, cardinality, noise in itertools.product(args.rows, args.attributes,
+                                                                      args.cardinality, args.noise):
+            config = {'rows': rows, 'attributes': attributes, 'cardinality': cardinality, 'noise': noise}
+            path = os.path.join(workdir, 'synthetic.csv')
+            generate_dataset(path, rows, attributes, cardinality, noise, seed=args.seed)
+            stages = benchmark_pipeline(path, workdir, args.memory, args.ce_max_boundary)
+            results['runs'].append({'key': config_key(config), 'config': config, 'stages': stages})
+            print("{:<60} total {:.4f} s".format(config_key(config), stages['total']['wall_s']))
+
+    if args.startup_runs > 0:
+        stages = measure_startup(args.startup_runs)
+        results['runs'].append({'key': 'startup', 'config': {'runs': args.startup_runs}, 'stages': stages})
+        for name, measures in stages.items():
+            print("{:<60} {} {:.4f} s".format('startup', name, measures['wall_s']))
+
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print("Results stored in {}".format(args.output))
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            regressions = compare_results(json.load(previous_file), results, args.threshold)
+        for key, stage, old_time, new_time, ratio in regressions:
+            print("REGRESSION {} {}: {:.4f} s -> {:.4f} s (x{:.2f})".format(key, stage, old_time, new_time, ratio))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
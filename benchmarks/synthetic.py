@@ -0,0 +1,37 @@
+import csv
+import random
+
+
+def generate_dataset(path, rows, attributes, cardinality, noise=0.0, concept_size=3, seed=0):
+    """
+    Write a synthetic categorical data training in CSV format (header row, attributes, 'result' as last column).
+    The label is a conjunctive concept on the first 'concept_size' attributes (the kind of target Candidate
+    Elimination can learn); each label is then flipped with probability 'noise'.
+    Rows are written one at a time, so memory does not depend on the number of rows.
+    :param path: CSV file - string
+    :param rows: number of records
+    :param attributes: number of attributes
+    :param cardinality: number of values of each attribute
+    :param noise: probability of flipping a label - 0.0 to 1.0
+    :param concept_size: number of attributes of the target concept
+    :param seed: random seed
+    :return: number of positive records
+    """
+    rng = random.Random(seed)
+    concept = [rng.randrange(cardinality) for _ in range(min(concept_size, attributes))]
+    positives = 0
+
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['A{}'.format(i) for i in range(attributes)] + ['result'])
+        for _ in range(rows):
+            # draw the concept attributes with a bias, so both labels are frequent
+            record = [value if rng.random() < 0.7 else rng.randrange(cardinality) for value in concept]
+            record += [rng.randrange(cardinality) for _ in range(attributes - len(concept))]
+            label = record[:len(concept)] == concept
+            if rng.random() < noise:
+                label = not label
+            positives += label
+            writer.writerow(['v{}'.format(value) for value in record] + [str(label)])
+
+    return positives
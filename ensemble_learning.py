@@ -3,22 +3,32 @@
 
 # Copyright (C) 2015-2016, Giordano Sala
 
-from src import support_functions
-from src.naive_bayes import CalcNaiveBayes
-from src.candidate_elimination import CalcCandidateElimination
-from src.support_vector import CalcSupportVector
+# Only light modules are imported here: each command imports the modules it needs (and with them NumPy,
+# scikit-learn, xlrd and xlsxwriter) when it runs, so the menu and --help start at once.
+
+import argparse
+import os
+import sys
+
+from src import defaults
+from src import instrumentation
+from src.model_cache import ModelCache
 from termcolor import *
 
-if __name__ == "__main__":
+# possible data training
+MATRIX_FILES = {
+    '1': 'src/data/data_balloons.xls',
+    '2': 'src/data/enjoy_sport.xlsx',
+    '3': 'src/data/economic_car.xls',
+    '4': 'src/data/breast_cancer.xls',
+}
 
-    # possible data training
-    matrix_files = {
-        '1': 'src/data/data_balloons.xls',
-        '2': 'src/data/enjoy_sport.xlsx',
-        '3': 'src/data/economic_car.xls',
-        '4': 'src/data/breast_cancer.xls',
-    }
 
+def interactive(cache):
+    """
+    Menu loop: choose a data training, show performance indexes and predict new records typed by the user
+    :param cache: ModelCache
+    """
     answers_list = ['1', '2', '3', '4', 'q']
 
     while True:
@@ -39,78 +49,32 @@ if __name__ == "__main__":
             break
         cprint("*** - *** - *** - *** - *** - ***", 'blue')
 
-        # load data training
-        print("Read data from Excel files ...")
-        real_data, header = support_functions.read_data(matrix_files[answer])
-        binary_data, total_values = support_functions.convert_data(real_data)
-        print("Done!")
-        cprint("*** - *** - *** - *** - *** - ***", 'blue')
-
-        # prepare data
-        print("Preparing data ...")
-        data, target = support_functions.prepare_data(binary_data, header)
-        print("Done!")
-        cprint("*** - *** - *** - *** - *** - ***", 'blue')
-
-        # Naive Bayes section
-        print("Naive Bayes training ...")
-        nb = CalcNaiveBayes()
-        nb.training(data, target)
-        print("Done!")
-        cprint("*** - *** - *** - *** - *** - ***", 'blue')
-
-        # Candidate Elimination section
-        print("Candidate Elimination training ...")
-        ce = CalcCandidateElimination(data, target)
-        ce.candidate_elimination()
-        print("Done!")
-        cprint("*** - *** - *** - *** - *** - ***", 'blue')
-
-        # Support Vector
-        print("Support Vector training ...")
-        sv = CalcSupportVector()
-        sv.training(data, target)
+        # load data training, reusing classifiers trained on the same file content
+        print("Read data and train classifiers ...")
+        from src import support_functions
+        from src import training
+        from src.ensemble import Ensemble
+        trained = training.load_ensemble(MATRIX_FILES[answer], cache)
+        if trained['timings'] is None:
+            print("Trained classifiers loaded from cache")
+        else:
+            for key, name, _ in training.MEMBERS:
+                print("{} trained in {:.3f} s".format(name, trained['timings'][key]))
+        data, target = trained['data'], trained['target']
+        total_values, header = trained['total_values'], trained['header']
+        nb, ce, sv = trained['nb'], trained['ce'], trained['sv']
+        if ce.collapsed_at is not None:
+            cprint("Candidate Elimination: {} is empty after record {}, no hypothesis is consistent with the data "
+                   "training (the version space is empty)".format(ce.collapsed_boundary, ce.collapsed_at + 1), 'red')
+        ensemble = Ensemble.from_trained(trained)
         print("Done!")
         cprint("*** - *** - *** - *** - *** - ***", 'blue')
         cprint("*** - *** - *** - *** - *** - ***", 'blue')
 
         # Calculate performance indexes
-        confusion_matrix = support_functions.calc_performance(binary_data, header, nb, ce, sv)
-
-        possibilities = ['nb', 'ce', 'sv']
-        full_list = []
-        for possibility in possibilities:
-            single_list = []
-            acc = support_functions.calc_accuracy(confusion_matrix[possibility]['tn'],
-                                                  confusion_matrix[possibility]['fp'],
-                                                  confusion_matrix[possibility]['fn'],
-                                                  confusion_matrix[possibility]['tp'])
-
-            single_list.append(acc)
+        confusion_matrix = support_functions.calc_confusion_matrix(data, target, nb, ce, sv)
 
-            spec = support_functions.calc_specificity(confusion_matrix[possibility]['tn'],
-                                                      confusion_matrix[possibility]['fp'])
-
-            single_list.append(spec)
-
-            prec = support_functions.calc_precision(confusion_matrix[possibility]['tn'],
-                                                    confusion_matrix[possibility]['fp'])
-
-            single_list.append(prec)
-
-            prev = support_functions.calc_prevalence(confusion_matrix[possibility]['tn'],
-                                                     confusion_matrix[possibility]['fp'],
-                                                     confusion_matrix[possibility]['fn'],
-                                                     confusion_matrix[possibility]['tp'])
-
-            single_list.append(prev)
-
-            sens = support_functions.calc_sensitivity(confusion_matrix[possibility]['tn'],
-                                                      confusion_matrix[possibility]['fp'])
-
-            single_list.append(sens)
-
-            full_list.append(single_list)
+        full_list = support_functions.calc_indexes(confusion_matrix)
 
         support_functions.write_charts(full_list)
 
@@ -137,18 +101,17 @@ if __name__ == "__main__":
         if error_found:
             continue
 
-        # Show results
-        final_results = [nb.prediction(new_record)[0], ce.prediction(new_record), sv.prediction(new_record)[0]]
+        # Judge: members are evaluated cheapest-first until the majority is decided
+        verdict, votes = ensemble.decide(new_record[0])
 
-        print("Naive Bayes result {}".format(True if nb.prediction(new_record)[0] == 1 else False))
-        print("Candidate Elimination result {}".format(True if ce.prediction(new_record) == 1 else False))
-        print("Support Vector result {}".format(True if sv.prediction(new_record)[0] == 1 else False))
-
-        # Judge
-        false_values = final_results.count(0)
-        true_values = final_results.count(1)
+        # Show results
+        for key, name, _ in training.MEMBERS:
+            if key in votes:
+                print("{} result {}".format(name, True if votes[key] == 1 else False))
+            else:
+                print("{} result not needed, majority already reached".format(name))
 
-        if true_values > false_values:
+        if verdict:
             cprint("Judge says True", 'blue')
         else:
             cprint("Judge says False", 'blue')
@@ -162,3 +125,235 @@ if __name__ == "__main__":
             break
         elif another_one not in ['y', 'n']:
             cprint("Choice not allowed", 'red')
+
+
+def score(args, cache):
+    """
+    Score a file of unlabelled records without user interaction
+    :param args: parsed command line arguments (dataset, input, output, block_size, weights, judge_only, lookup,
+                 lookup_size)
+    :param cache: ModelCache
+    """
+    from src import prediction_table
+    from src import scoring
+    from src import training
+    from src.ensemble import Ensemble, parse_weights
+
+    path = MATRIX_FILES.get(args.dataset, args.dataset)
+    trained = training.load_ensemble(path, cache)
+    ensemble = Ensemble.from_trained(trained, parse_weights(args.weights) if args.weights else None)
+    table = None
+    if args.lookup:
+        table = prediction_table.PredictionTable(trained, ensemble, max_size=args.lookup_size)
+    num_records, unknown = scoring.score_file(trained, args.input, args.output, ensemble=ensemble,
+                                              judge_only=args.judge_only, table=table, block_size=args.block_size)
+    print("{} records scored, results stored in {}".format(num_records, args.output))
+    if table is not None:
+        stats = table.stats()
+        print("Lookup {} (input space {} records): {} hits, {} misses".format(stats['mode'], stats['input_space'],
+                                                                             stats['hits'], stats['misses']))
+    elif args.judge_only:
+        stats = ensemble.stats()
+        print("Judge short-circuited {} of {} records ({:.1%})".format(stats['short_circuits'], stats['decisions'],
+                                                                      stats['short_circuit_rate']))
+    if unknown:
+        cprint("{} values were never seen in data training".format(unknown), 'red')
+
+
+def crossval(args):
+    """
+    Write the performance indexes measured with k-fold cross validation instead of on the data training
+    :param args: parsed command line arguments (dataset, folds, stratified, workers, seed, output)
+    """
+    from src import cross_validation
+    from src import support_functions
+    from src import training
+    from src.dataset import Dataset
+
+    path = MATRIX_FILES.get(args.dataset, args.dataset)
+    dataset = Dataset.load(path)
+    folds = args.folds
+    if folds > len(dataset):
+        # leave-one-out on data trainings with fewer records than folds (enjoy_sport, economic_car)
+        cprint("{} folds for {} records: using {} folds".format(folds, len(dataset), len(dataset)), 'red')
+        folds = len(dataset)
+    try:
+        confusion_matrix, fold_matrices = cross_validation.cross_validate(dataset.values, dataset.target, folds,
+                                                                          stratified=args.stratified,
+                                                                          workers=args.workers, seed=args.seed,
+                                                                          domains=dataset.domains)
+    except ValueError as error:
+        cprint("Cross validation not possible: {}".format(error), 'red')
+        sys.exit(1)
+    for key, name, _ in training.MEMBERS:
+        print("{} {}".format(name, confusion_matrix[key]))
+    support_functions.write_charts(support_functions.calc_indexes(confusion_matrix), args.output)
+    cprint("Cross validation results ({} folds) are stored in '{}' file".format(len(fold_matrices), args.output),
+           'blue')
+
+
+def batch(args):
+    """
+    Evaluate several data trainings and write a single report
+    :param args: parsed command line arguments (sources, output, workers, folds)
+    """
+    from src import batch_run
+
+    paths = batch_run.dataset_paths(args.sources or list(MATRIX_FILES.values()))
+    if not paths:
+        cprint("No data training found", 'red')
+        return
+    reports = batch_run.run_batch(paths, args.output, args.workers, args.folds)
+    for report in reports:
+        if report.get('error'):
+            cprint("{}: {}".format(report['name'], report['error']), 'red')
+        else:
+            print("{}: {} records in {:.2f} s".format(report['name'], report['records'], report['seconds']))
+    cprint("Performance results are stored in '{}' file".format(args.output), 'blue')
+
+
+def chunked(args):
+    """
+    Train Naive Bayes and Support Vector streaming the data trainings from disk, one block of rows at a time, and
+    show their accuracy; with --parity compare it with the in-memory training
+    :param args: parsed command line arguments (sources, block_size, max_passes, parity)
+    """
+    from src import batch_run
+    from src import chunked_training
+
+    paths = batch_run.dataset_paths(args.sources or list(MATRIX_FILES.values()))
+    if args.parity:
+        report = chunked_training.parity_report(paths, args.block_size, args.max_passes)
+        print("{:<20}{:>9}{:>12}{:>12}{:>12}{:>12}".format('Data training', 'records', 'NB memory', 'NB chunked',
+                                                          'SV memory', 'SV chunked'))
+        for row in report:
+            print("{:<20}{:>9}{:>12.4f}{:>12.4f}{:>12.4f}{:>12.4f}".format(row['name'], row['records'],
+                                                                          row['nb'][0], row['nb'][1],
+                                                                          row['sv'][0], row['sv'][1]))
+        return
+
+    print("{:<20}{:>9}{:>12}{:>12}{:>12}".format('Data training', 'records', 'NB', 'SV', 'SV passes'))
+    for path in paths:
+        trained = chunked_training.train_file(path, args.block_size, args.max_passes)
+        accuracy = {key: chunked_training.block_accuracy(trained[key], chunked_training.file_blocks(path))
+                    for key in ('nb', 'sv')}
+        print("{:<20}{:>9}{:>12.4f}{:>12.4f}{:>12}".format(os.path.splitext(os.path.basename(path))[0],
+                                                          trained['records'], accuracy['nb'], accuracy['sv'],
+                                                          trained['sv'].model.n_iter_))
+
+
+def serve(args, cache):
+    """
+    Run the local prediction service until interrupted
+    :param args: parsed command line arguments (dataset, host, port, window, max_batch, lookup, lookup_size)
+    :param cache: ModelCache
+    """
+    from src import prediction_server
+    from src import prediction_table
+    from src import training
+
+    path = MATRIX_FILES.get(args.dataset, args.dataset)
+    trained = training.load_ensemble(path, cache)
+    table = None
+    if args.lookup:
+        table = prediction_table.PredictionTable(trained, max_size=args.lookup_size)
+    server = prediction_server.create_server(trained, args.host, args.port, args.window / 1000.0, args.max_batch,
+                                             table=table)
+    host, port = server.server_address[:2]
+    print("Prediction service listening on http://{}:{} (POST /predict, GET /stats)".format(host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ensemble learning: Naive Bayes, Candidate Elimination and "
+                                                 "Support Vector with a majority judge")
+    parser.add_argument('--profile', metavar='JSON',
+                        help="record stage timings and counters and store them in this file at the end of the run")
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help="with --profile, also store cProfile statistics (pstats format) in this file")
+    subparsers = parser.add_subparsers(dest='command')
+    score_parser = subparsers.add_parser('score', help="score a file of unlabelled records")
+    score_parser.add_argument('dataset', help="data training: menu choice (1-4) or file path")
+    score_parser.add_argument('input', help="records to score (CSV or Excel with a header row)")
+    score_parser.add_argument('output', help="CSV file with the results")
+    score_parser.add_argument('--block-size', type=int, default=defaults.DEFAULT_BLOCK_SIZE,
+                              help="number of records scored together - default: %(default)s")
+    score_parser.add_argument('--weights', help="judge weight of each member - example nb=1,ce=0.5,sv=2")
+    score_parser.add_argument('--judge-only', action='store_true',
+                              help="write only the judge result, skipping members once the majority is reached")
+    score_parser.add_argument('--lookup', action='store_true',
+                              help="precompute the predictions of every possible record (or remember the ones seen)")
+    score_parser.add_argument('--lookup-size', type=int, default=defaults.DEFAULT_MAX_TABLE_SIZE,
+                              help="max records of the input space precomputed by --lookup - default: %(default)s")
+    crossval_parser = subparsers.add_parser('crossval', help="performance indexes with k-fold cross validation")
+    crossval_parser.add_argument('dataset', help="data training: menu choice (1-4) or file path")
+    crossval_parser.add_argument('--folds', type=int, default=defaults.DEFAULT_FOLDS,
+                                 help="number of folds - default: %(default)s")
+    crossval_parser.add_argument('--stratified', action='store_true',
+                                 help="keep the proportion of true and false results in every fold")
+    crossval_parser.add_argument('--workers', type=int, help="number of processes - default: number of cores")
+    crossval_parser.add_argument('--seed', type=int, default=0, help="random seed of the folds")
+    crossval_parser.add_argument('--output', default='Performance_recap.xls')
+    batch_parser = subparsers.add_parser('batch', help="evaluate several data trainings in a single report")
+    batch_parser.add_argument('sources', nargs='*',
+                              help="data training files or directories - default: the data trainings of the menu")
+    batch_parser.add_argument('--output', default='Performance_batch.xlsx')
+    batch_parser.add_argument('--workers', type=int, help="number of processes - default: number of cores")
+    batch_parser.add_argument('--folds', type=int,
+                              help="evaluate with stratified k-fold cross validation instead of on the data training")
+    chunked_parser = subparsers.add_parser('chunked', help="train Naive Bayes and Support Vector streaming the data "
+                                                           "trainings from disk, one block of rows at a time")
+    chunked_parser.add_argument('sources', nargs='*',
+                                help="data training files or directories - default: the data trainings of the menu")
+    chunked_parser.add_argument('--block-size', type=int, default=defaults.DEFAULT_BLOCK_SIZE,
+                                help="number of rows of each block - default: %(default)s")
+    chunked_parser.add_argument('--max-passes', type=int, default=defaults.DEFAULT_MAX_PASSES,
+                                help="max passes of Support Vector over each file - default: %(default)s")
+    chunked_parser.add_argument('--parity', action='store_true',
+                                help="compare the accuracy with the in-memory training (reads each file in memory)")
+    serve_parser = subparsers.add_parser('serve', help="run a local prediction service")
+    serve_parser.add_argument('dataset', help="data training: menu choice (1-4) or file path")
+    serve_parser.add_argument('--host', default=defaults.DEFAULT_HOST, help="default: %(default)s")
+    serve_parser.add_argument('--port', type=int, default=defaults.DEFAULT_PORT, help="default: %(default)s")
+    serve_parser.add_argument('--window', type=float, default=defaults.DEFAULT_WINDOW * 1000,
+                              help="micro-batching window in milliseconds - default: %(default)g")
+    serve_parser.add_argument('--max-batch', type=int, default=defaults.DEFAULT_MAX_BATCH,
+                              help="max records predicted together - default: %(default)s")
+    serve_parser.add_argument('--lookup', action='store_true',
+                              help="precompute the predictions of every possible record (or remember the ones seen)")
+    serve_parser.add_argument('--lookup-size', type=int, default=defaults.DEFAULT_MAX_TABLE_SIZE,
+                              help="max records of the input space precomputed by --lookup - default: %(default)s")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        instrumentation.enable(profile=bool(args.cprofile))
+
+    cache = ModelCache()
+    try:
+        with instrumentation.stage('run.' + (args.command or 'interactive')):
+            if args.command == 'score':
+                score(args, cache)
+            elif args.command == 'batch':
+                batch(args)
+            elif args.command == 'crossval':
+                crossval(args)
+            elif args.command == 'chunked':
+                chunked(args)
+            elif args.command == 'serve':
+                serve(args, cache)
+            else:
+                interactive(cache)
+    finally:
+        if args.profile:
+            instrumentation.dump(args.profile, args.cprofile)
+            print("Profile stored in {}".format(args.profile))
+
+
+if __name__ == "__main__":
+    main()
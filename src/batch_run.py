@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src import cross_validation
+from src import support_functions
+from src import training
+from src.dataset import Dataset
+
+# extensions of the files read when a directory is given
+DATA_EXTENSIONS = ('.xls', '.xlsx', '.csv')
+
+
+def dataset_paths(sources):
+    """
+    :param sources: list of files and directories - example ['src/data', 'other.csv']
+    :return: list of data training files, directories expanded to their files sorted by name
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths += [os.path.join(source, file_name) for file_name in sorted(os.listdir(source))
+                      if file_name.lower().endswith(DATA_EXTENSIONS)]
+        else:
+            paths.append(source)
+    return paths
+
+
+def evaluate_dataset(path, folds=None):
+    """
+    Train the ensemble on a data training file and calculate the performance indexes of each classifier
+    :param path: data training file - string
+    :param folds: number of folds of a stratified cross validation, None to evaluate on the data training
+    :return: dictionary with keys name, path, records, seconds and confusion_matrix and indexes,
+             or error if the file cannot be evaluated
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    start = time.perf_counter()
+    try:
+        dataset = Dataset.load(path)
+        if folds:
+            # leave-one-out on data trainings with fewer records than folds
+            confusion_matrix, _ = cross_validation.cross_validate(dataset.values, dataset.target,
+                                                                  min(folds, len(dataset)),
+                                                                  stratified=True, workers=1,
+                                                                  domains=dataset.domains)
+        else:
+            classifiers, _ = training.train_members(dataset.values, dataset.target, workers=1,
+                                                    domains=dataset.domains)
+            confusion_matrix = support_functions.calc_confusion_matrix(dataset.values, dataset.target,
+                                                                       classifiers['nb'], classifiers['ce'],
+                                                                       classifiers['sv'])
+    except Exception as error:
+        # a bad file must not stop the other data trainings
+        return {'name': name, 'path': path, 'seconds': time.perf_counter() - start,
+                'error': '{}: {}'.format(type(error).__name__, error)}
+
+    return {'name': name, 'path': path, 'records': len(dataset), 'seconds': time.perf_counter() - start,
+            'confusion_matrix': confusion_matrix, 'indexes': support_functions.calc_indexes(confusion_matrix)}
+
+
+def run_batch(paths, output='Performance_batch.xlsx', workers=None, folds=None):
+    """
+    Evaluate every data training file in a process pool (one file per process at a time) and write a single
+    report workbook (see support_functions.write_report)
+    :param paths: data training files - list
+    :param output: Excel file - string
+    :param workers: number of processes - default: number of cores, 1 runs everything in this process
+    :param folds: see evaluate_dataset
+    :return: list of reports of evaluate_dataset, in the order of paths
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+
+    if workers <= 1:
+        reports = [evaluate_dataset(path, folds) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            reports = list(executor.map(evaluate_dataset, paths, [folds] * len(paths)))
+
+    support_functions.write_report(reports, output)
+    return reports
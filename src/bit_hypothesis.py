@@ -0,0 +1,226 @@
+import numpy as np
+
+
+class BitHypothesisCodec:
+    """
+    Bit-packed hypotheses for Candidate Elimination.
+
+    Every attribute owns a fixed-width field of bits. A hypothesis is a pair of integers (mask, value):
+    - mask: all bits of the fields that are constrained set to 1 ('?' fields are 0)
+    - value: the required attribute code inside each constrained field
+
+    The all-ones code of a field is reserved for the empty value '*', that no instance can take.
+    An instance is packed in the same layout as a single integer, so matching and generality tests
+    become a few bitwise operations instead of a walk over tuples of strings.
+
+    examples with 3 binary attributes (width 2, '*' = 3):
+    - ('?', '?', '?') => (0b000000, 0b000000)
+    - ('1', '?', '0') => (0b110011, 0b000001)
+    - ('*', '*', '*') => (0b111111, 0b111111)
+    """
+
+    def __init__(self, num_attributes, max_code):
+        """
+        :param num_attributes: number of attributes of each record
+        :param max_code: highest attribute code that can appear in an instance
+        """
+        self.num_attributes = num_attributes
+        # binary specializations can always produce code 1
+        self.width = (max(max_code, 1) + 1).bit_length()
+        self.empty_code = (1 << self.width) - 1
+        self.field_masks = [self.empty_code << (i * self.width) for i in range(num_attributes)]
+        self.full_mask = sum(self.field_masks)
+        self.low_bits = sum(1 << (i * self.width) for i in range(num_attributes))
+        self.empty_value = self.empty_code * self.low_bits
+
+    def most_general(self):
+        """
+        :return: packed ('?', '?', ..., '?')
+        """
+        return 0, 0
+
+    def most_specific(self):
+        """
+        :return: packed ('*', '*', ..., '*')
+        """
+        return self.full_mask, self.empty_value
+
+    def encode_instance(self, record):
+        """
+        Pack a record of attribute codes in a single integer.
+        Codes outside the field range are folded onto the empty code (see unknown_fields).
+        :param record: list or tuple of codes - example [0, 1, 0, 0] or ('0', '1', '0', '0')
+        :return: integer
+        """
+        bits = 0
+        for idx, code in enumerate(record):
+            code = int(code)
+            if code < 0 or code >= self.empty_code:
+                code = self.empty_code
+            bits |= code << (idx * self.width)
+        return bits
+
+    def encode_instances(self, records):
+        """
+        Pack every record of a matrix (see encode_instance), with NumPy when the packed records fit in 63 bits
+        :param records: integer matrix (records x attributes) - example [[0, 1, 0, 0], [1, 1, 0, 0]]
+        :return: list of integers
+        """
+        records = np.asarray(records, dtype=np.int64).reshape(-1, self.num_attributes)
+        if self.width * self.num_attributes > 63:
+            return [self.encode_instance(record) for record in records.tolist()]
+        codes = np.where((records < 0) | (records >= self.empty_code), self.empty_code, records)
+        shifts = np.arange(self.num_attributes, dtype=np.int64) * self.width
+        # fields do not overlap, so the sum is the bitwise or
+        return (codes << shifts).sum(axis=1).tolist()
+
+    def unknown_fields(self, record):
+        """
+        :param record: list or tuple of codes - example [0, 7, 0, 0]
+        :return: mask of the fields whose code is outside the field range, that no constrained field must match
+        """
+        unknown = 0
+        for idx, code in enumerate(record):
+            code = int(code)
+            if code < 0 or code >= self.empty_code:
+                unknown |= self.field_masks[idx]
+        return unknown
+
+    def encode(self, hypothesis):
+        """
+        :param hypothesis: tuple - example ('0', '?', '*')
+        :return: (mask, value)
+        """
+        mask = 0
+        value = 0
+        for idx, factor in enumerate(hypothesis):
+            if factor == '?':
+                continue
+            code = self.empty_code if factor == '*' else int(factor)
+            mask |= self.field_masks[idx]
+            value |= code << (idx * self.width)
+        return mask, value
+
+    def decode(self, hypothesis):
+        """
+        String view of a packed hypothesis, used for display only.
+        :param hypothesis: (mask, value)
+        :return: tuple - example ('0', '?', '*')
+        """
+        mask, value = hypothesis
+        factors = []
+        for idx in range(self.num_attributes):
+            if not mask & self.field_masks[idx]:
+                factors.append('?')
+                continue
+            code = (value >> (idx * self.width)) & self.empty_code
+            factors.append('*' if code == self.empty_code else str(code))
+        return tuple(factors)
+
+    def unpack(self, hypothesis):
+        """
+        Split a packed hypothesis in one entry per attribute.
+        :param hypothesis: (mask, value)
+        :return:
+        - constrained: list of bool - False for '?'
+        - codes: list of int - required code, -1 for '*' and 0 for '?'
+        """
+        mask, value = hypothesis
+        constrained = []
+        codes = []
+        for idx in range(self.num_attributes):
+            code = (value >> (idx * self.width)) & self.empty_code
+            constrained.append(bool(mask & self.field_masks[idx]))
+            codes.append(-1 if code == self.empty_code else code)
+        return constrained, codes
+
+    def spread(self, bits):
+        """
+        Extend every non-zero field of 'bits' to the whole field.
+        :param bits: integer
+        :return: integer with the fields that contain at least one bit set to 1 fully set
+        """
+        flags = 0
+        for shift in range(self.width):
+            flags |= (bits >> shift) & self.low_bits
+        return flags * self.empty_code
+
+    def match(self, hypothesis, instance):
+        """
+        :param hypothesis: (mask, value)
+        :param instance: packed instance - integer
+        :return: True if hypothesis matches with instance, False otherwise
+        """
+        mask, value = hypothesis
+        return instance & mask == value
+
+    def more_general(self, hyp1, hyp2):
+        """
+        Same semantic of candidate_elimination.more_general on packed hypotheses:
+        hyp1 must constrain a subset of the fields of hyp2, with the same codes.
+        :param hyp1: (mask, value)
+        :param hyp2: (mask, value)
+        :return: True or False
+        """
+        mask1, value1 = hyp1
+        mask2, value2 = hyp2
+        return not mask1 & ~mask2 and value2 & mask1 == value1
+
+    def min_generalization(self, s, instance):
+        """
+        :param s: (mask, value) - member of S
+        :param instance: packed instance - integer
+        :return: the minimal generalization of s that matches instance
+
+        Empty fields take the instance code, any other contradiction becomes '?'
+        """
+        mask, value = s
+        contradictions = self.spread((value ^ instance) & mask)
+        empty_fields = mask & ~self.spread((value ^ self.empty_value) & mask)
+        replaced = contradictions & empty_fields
+        new_mask = mask & ~(contradictions & ~empty_fields)
+        new_value = (value & new_mask & ~replaced) | (instance & replaced)
+        return new_mask, new_value
+
+    def min_specializations(self, g, instance, domains=None):
+        """
+        Minimal specializations of g that do not match instance: every '?' field takes, in turn, each code of the
+        attribute domain except the instance code.
+        Without domains every attribute is binary, as candidate_elimination.get_min_specializations:
+        the field becomes 1 if the instance code is 0, otherwise 0.
+        :param g: (mask, value)
+        :param instance: packed instance - integer
+        :param domains: number of codes of each attribute - list - example [2, 3, 10]
+        :return: list of (mask, value)
+        """
+        mask, value = g
+        specializations = []
+        for idx, field in enumerate(self.field_masks):
+            if mask & field:
+                continue
+            shift = idx * self.width
+            instance_code = (instance & field) >> shift
+            if domains is None:
+                codes = [0 if instance_code else 1]
+            else:
+                codes = [code for code in range(domains[idx]) if code != instance_code]
+            specializations += [(mask | field, value | (code << shift)) for code in codes]
+        return specializations
+
+    def covers_nothing(self, hypothesis):
+        """
+        :param hypothesis: (mask, value)
+        :return: True if a constrained field holds the empty code '*', so no instance matches hypothesis
+        """
+        mask, value = hypothesis
+        return self.spread((value ^ self.empty_value) & mask) != mask
+
+    def hybrid(self, s, g, idx):
+        """
+        :param s: (mask, value) - member of S
+        :param g: (mask, value) - member of G
+        :param idx: attribute index
+        :return: hypothesis with the field 'idx' of s and every other field of g
+        """
+        field = self.field_masks[idx]
+        return (g[0] & ~field) | (s[0] & field), (g[1] & ~field) | (s[1] & field)
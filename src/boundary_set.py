@@ -0,0 +1,95 @@
+class BoundarySet:
+    """
+    Set of packed hypotheses (mask, value) for the S and G boundaries of Candidate Elimination.
+
+    Members are deduplicated and kept in insertion order (a dict), so removal is O(1).
+    They are also indexed by mask, i.e. by the set of constrained attributes: a hypothesis can only be
+    more general than another one if its mask is a subset of the other mask, so dominance checks only
+    look at those masks. Checking if a member is more general than h is a single lookup per mask m:
+    the only candidate is (m, value of h restricted to m).
+    """
+
+    def __init__(self, hypotheses=()):
+        self.members = {}
+        self.index = {}     # mask -> set of values
+        for hypothesis in hypotheses:
+            self.add(hypothesis)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(list(self.members))
+
+    def __contains__(self, hypothesis):
+        return hypothesis in self.members
+
+    def __repr__(self):
+        return 'BoundarySet({})'.format(list(self.members))
+
+    def add(self, hypothesis):
+        """
+        :param hypothesis: (mask, value)
+        :return: True if it was not a member yet
+        """
+        if hypothesis in self.members:
+            return False
+        self.members[hypothesis] = None
+        mask, value = hypothesis
+        self.index.setdefault(mask, set()).add(value)
+        return True
+
+    def discard(self, hypothesis):
+        """
+        :param hypothesis: (mask, value) - nothing happens if it is not a member
+        """
+        if hypothesis not in self.members:
+            return
+        del self.members[hypothesis]
+        mask, value = hypothesis
+        values = self.index[mask]
+        values.discard(value)
+        if not values:
+            del self.index[mask]
+
+    def has_more_general(self, hypothesis, strict=False):
+        """
+        :param hypothesis: (mask, value)
+        :param strict: if True, the hypothesis itself does not count
+        :return: True if a member is more general than hypothesis (more_general(member, hypothesis))
+        """
+        mask, value = hypothesis
+        for member_mask, values in self.index.items():
+            if member_mask & ~mask or (strict and member_mask == mask):
+                continue
+            if value & member_mask in values:
+                return True
+        return False
+
+    def more_specific_members(self, hypothesis, strict=False):
+        """
+        :param hypothesis: (mask, value)
+        :param strict: if True, the hypothesis itself is not returned
+        :return: list of members h such that more_general(hypothesis, h)
+        """
+        mask, value = hypothesis
+        members = []
+        for member_mask, values in self.index.items():
+            if mask & ~member_mask or (strict and member_mask == mask):
+                continue
+            members += [(member_mask, v) for v in values if v & mask == value]
+        return members
+
+    def add_maximal(self, hypothesis):
+        """
+        Add hypothesis keeping only the most general members (an antichain): it is not added if a member is
+        more general, and the members it is more general than are removed.
+        :param hypothesis: (mask, value)
+        :return: True if it was added
+        """
+        if hypothesis in self.members or self.has_more_general(hypothesis, strict=True):
+            return False
+        for member in self.more_specific_members(hypothesis, strict=True):
+            self.discard(member)
+        self.add(hypothesis)
+        return True
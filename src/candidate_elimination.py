@@ -1,3 +1,30 @@
+import numpy as np
+
+from src import instrumentation
+from src.bit_hypothesis import BitHypothesisCodec
+from src.boundary_set import BoundarySet
+
+# max number of (record, hypothesis, attribute) comparisons evaluated at once by batch_prediction
+BATCH_BLOCK_SIZE = 1 << 20
+
+# orders of the training examples:
+# - file: as read
+# - positives_first: positive examples first (in file order), then the others. S reaches its final value while
+#   G is still the most general hypothesis, so the specializations of the negative examples are pruned the most
+TRAINING_ORDERS = ('file', 'positives_first')
+
+# scoring rules of the bounded (beam) mode, used to choose the hypotheses kept in S and G:
+# - general: fewest constrained attributes
+# - consistent: most of the last BEAM_SCORE_WINDOW examples seen classified correctly (matching the positive ones only)
+BEAM_SCORES = ('general', 'consistent')
+BEAM_SCORE_WINDOW = 1000
+
+# training status
+CONSISTENT = 'consistent'
+COLLAPSED = 'collapsed'     # S or G became empty: no hypothesis is consistent with the examples
+EXHAUSTED = 'exhausted'     # beam mode: S or G became empty after hypotheses were dropped, a larger beam may not
+
+
 def prepare_data(data, target):
     """
     Adjusts data format
@@ -189,15 +216,193 @@ def remove_more_specific(hypothesis):
 class CalcCandidateElimination:
     """
     Candidate Elimination Class
+
+    Hypotheses are handled in bit-packed form (see BitHypothesisCodec) and S and G are BoundarySet objects:
+    max_general, max_specific and version_space return the string tuples only as a view for display.
+
+    With boundary_prediction=True the version space is never built: records are classified only with S and G
+    (see boundary_votes).
+
+    Training stops at the first example leaving S or G empty: status becomes COLLAPSED, collapsed_at is the index
+    of that example and the version space is empty (every record is classified 0).
+
+    With max_boundary_size (beam mode) S and G never keep more than max_boundary_size hypotheses after an example:
+    the best ones under beam_score are kept and dropped_hypotheses counts the others. The boundaries, and the
+    version space built from them, are then an approximation, in exchange for bounded time and memory.
+    When the dropped hypotheses leave S or G empty, S and G are trained again on the examples seen so far, positive
+    examples first (see rebuild_boundaries); if they are still empty the status is EXHAUSTED instead of COLLAPSED:
+    S and G are kept as they were before the example that emptied one of them.
     """
 
-    def __init__(self, data, target):
-        self.training_data = prepare_data(data, target)
-        self.num_attributes = len(data[0])
-        self.max_general = [tuple(['?' for i in range(self.num_attributes)])]   # G <- Maximally general hypotheses
-        self.max_specific = [tuple(['*' for i in range(self.num_attributes)])]  # S <- Maximally specific hypotheses
-        self.numFactors = 4
-        self.version_space = []
+    def __init__(self, data, target, boundary_prediction=False, domains=None, order='file', max_boundary_size=None,
+                 beam_score='general'):
+        """
+        :param data: list of list or 2D array - encoded records
+        :param target: list or array of results (1 or 0)
+        :param boundary_prediction: classify with S and G only, without building the version space
+        :param domains: number of codes of each attribute - default: highest code of each column + 1,
+                        i.e. the size of the code tables of the data training
+        :param order: order of the training examples, one of TRAINING_ORDERS
+        :param max_boundary_size: max hypotheses of S and of G, None for the exact algorithm
+        :param beam_score: rule choosing the hypotheses kept by max_boundary_size, one of BEAM_SCORES
+        """
+        if order not in TRAINING_ORDERS:
+            raise ValueError("Unknown training order '{}', expected one of: {}".format(order,
+                                                                                       ", ".join(TRAINING_ORDERS)))
+        if beam_score not in BEAM_SCORES:
+            raise ValueError("Unknown beam score '{}', expected one of: {}".format(beam_score, ", ".join(BEAM_SCORES)))
+        if max_boundary_size is not None and max_boundary_size < 1:
+            raise ValueError("Max boundary size must be at least 1")
+        self.boundary_prediction = boundary_prediction
+        self.order = order
+        self.max_boundary_size = max_boundary_size
+        self.beam_score = beam_score
+        self.dropped_hypotheses = 0     # hypotheses removed from S and G by max_boundary_size
+        self.collapsed_at = None        # index of the example that emptied S or G
+        self.collapsed_boundary = None  # 'S' or 'G'
+        self.beam_exhausted = False     # beam mode: the empty boundary may be due to the dropped hypotheses
+        self.beam_rebuilds = 0          # times S and G were trained again by rebuild_boundaries
+        self.training_values = np.asarray(data)     # matrix records x attributes
+        self.training_target = np.asarray(target)
+        self.num_attributes = self.training_values.shape[1]
+        if domains is None:
+            # in int64: the codes of a compact Dataset can be int8, where 127 + 1 overflows
+            domains = (self.training_values.max(axis=0).astype(np.int64) + 1).tolist()
+        self.domains = [int(size) for size in domains]
+        self.codec = BitHypothesisCodec(self.num_attributes, max(self.domains) - 1)
+        self.training_bits = self.codec.encode_instances(self.training_values)
+        self.general_boundary = BoundarySet([self.codec.most_general()])     # G <- Maximally general hypotheses
+        self.specific_boundary = BoundarySet([self.codec.most_specific()])   # S <- Maximally specific hypotheses
+        self.version_space_bits = []
+        self.version_space_counts = {}  # version space member -> number of S, G and (s, g) pairs generating it
+        self.vs_constrained = np.zeros((0, self.num_attributes), dtype=bool)  # version space masks matrix
+        self.vs_codes = np.zeros((0, self.num_attributes), dtype=np.int64)     # version space values matrix
+        self.vs_active = np.zeros(0, dtype=bool)
+        self.specific_constrained, self.specific_codes = self.compile_hypotheses([])   # S matrices
+        self.general_constrained, self.general_codes = self.compile_hypotheses([])     # G matrices
+
+    @property
+    def max_general(self):
+        return [self.codec.decode(g) for g in self.general_boundary]
+
+    @property
+    def max_specific(self):
+        return [self.codec.decode(s) for s in self.specific_boundary]
+
+    @property
+    def version_space(self):
+        return [self.codec.decode(h) for h in self.version_space_bits]
+
+    @property
+    def training_data(self):
+        return prepare_data(self.training_values.tolist(), self.training_target.tolist())
+
+    @property
+    def status(self):
+        if self.collapsed_at is None:
+            return CONSISTENT
+        return EXHAUSTED if self.beam_exhausted else COLLAPSED
+
+    def training_order(self, target, start=0):
+        """
+        :param target: array of results of the examples
+        :param start: index of the first example
+        :return: indexes of the examples in the order they are processed (see TRAINING_ORDERS)
+        """
+        if self.order == 'positives_first':
+            return (start + np.argsort(target != 1, kind='stable')).tolist()
+        return list(range(start, start + len(target)))
+
+    def check_collapse(self, index, seen):
+        """
+        Stop the training if S or G is empty after an example: the version space is empty and stays empty,
+        so S and G are cleared and the remaining examples are skipped.
+        In beam mode an empty boundary may be due to the dropped hypotheses: S and G are trained again on the
+        examples seen (see rebuild_boundaries) and, if one is still empty, the training stops as EXHAUSTED with
+        S and G as they were before the example that emptied it.
+        :param index: index of the example just processed
+        :param seen: indexes of the examples processed so far
+        :return: True if the training stops
+        """
+        if self.specific_boundary and self.general_boundary:
+            return False
+        self.collapsed_boundary = 'G' if self.specific_boundary else 'S'
+        if self.dropped_hypotheses:
+            if self.rebuild_boundaries(seen):
+                self.collapsed_boundary = None
+                return False
+            self.beam_exhausted = True
+        else:
+            self.specific_boundary = BoundarySet()
+            self.general_boundary = BoundarySet()
+        self.collapsed_at = index
+        instrumentation.set_counter('ce.collapsed_at', index)
+        return True
+
+    def rebuild_boundaries(self, seen):
+        """
+        Beam mode: train S and G again on the examples seen so far, positive examples first. S is exact once the
+        positive examples are processed and G is then specialized only towards S, so the members kept by the beam
+        still cover every positive example seen
+        :param seen: indexes of the examples processed so far
+        :return: True if S and G are not empty, otherwise False with S and G restored as they were before the
+                 example that emptied one of them
+        """
+        self.beam_rebuilds += 1
+        instrumentation.count('ce.beam_rebuilds')
+        self.general_boundary = BoundarySet([self.codec.most_general()])
+        self.specific_boundary = BoundarySet([self.codec.most_specific()])
+        seen = np.asarray(seen)
+        ordered = seen[np.argsort(self.training_target[seen] != 1, kind='stable')].tolist()
+        results = self.training_target.tolist()
+        replayed = []
+        for index in ordered:
+            previous = BoundarySet(self.specific_boundary), BoundarySet(self.general_boundary)
+            self.process_example(self.training_bits[index], results[index])
+            replayed.append(index)
+            self.bound_boundaries(replayed)
+            if not (self.specific_boundary and self.general_boundary):
+                self.specific_boundary, self.general_boundary = previous
+                return False
+        return True
+
+    def bound_boundaries(self, seen):
+        """
+        Beam mode: keep at most max_boundary_size hypotheses in S and in G
+        :param seen: indexes of the examples processed so far (scored by the 'consistent' rule)
+        """
+        if self.max_boundary_size is None:
+            return
+        self.specific_boundary = self.beam(self.specific_boundary, seen)
+        self.general_boundary = self.beam(self.general_boundary, seen)
+
+    def beam(self, boundary, seen):
+        """
+        :param boundary: BoundarySet
+        :param seen: indexes of the examples processed so far (the 'consistent' rule scores the last
+                     BEAM_SCORE_WINDOW ones)
+        :return: boundary if it is not larger than max_boundary_size, otherwise a BoundarySet with its best
+                 max_boundary_size hypotheses under beam_score (ties keep the oldest members)
+        """
+        if len(boundary) <= self.max_boundary_size:
+            return boundary
+        hypotheses = list(boundary)
+        constrained, codes = self.compile_hypotheses(hypotheses)
+        if self.beam_score == 'general':
+            scores = -constrained.sum(axis=1)
+        else:
+            window = seen[-BEAM_SCORE_WINDOW:]
+            values = self.training_values[window]
+            positive = self.training_target[window] == 1
+            scores = np.empty(len(hypotheses), dtype=np.int64)
+            for idx in range(len(hypotheses)):
+                matches = ((values == codes[idx]) | ~constrained[idx]).all(axis=1)
+                scores[idx] = np.count_nonzero(matches == positive)
+        kept = np.sort(np.argsort(-scores, kind='stable')[:self.max_boundary_size])
+        dropped = len(hypotheses) - len(kept)
+        self.dropped_hypotheses += dropped
+        instrumentation.count('ce.dropped_hypotheses', dropped)
+        return BoundarySet(hypotheses[idx] for idx in kept.tolist())
 
     def candidate_elimination(self):
         """
@@ -227,108 +432,375 @@ class CalcCandidateElimination:
                                                                           some member of S is more specific than h
                     remove from G any hypothesis less general than another in G
 
+        G and S are kept in bit-packed form, the tuples above are their display view.
+        Examples are processed in the training order and the loop stops as soon as S or G is empty (see check_collapse).
+        In beam mode S and G are bounded after each example (see bound_boundaries).
+
         :return: version space
         """
+        # |S| and |G| after each example are only collected when instrumentation is enabled
+        record_sizes = instrumentation.ENABLED
+        specific_sizes, general_sizes = [], []
+        self.collapsed_at = self.collapsed_boundary = None
+        self.beam_exhausted = False
+        self.dropped_hypotheses = 0
+        results = self.training_target.tolist()
+        seen = []
+        with instrumentation.stage('ce.boundaries'):
+            for index in self.training_order(self.training_target):
+                self.process_example(self.training_bits[index], results[index])
+                seen.append(index)
+                self.bound_boundaries(seen)
+                if record_sizes:
+                    specific_sizes.append(len(self.specific_boundary))
+                    general_sizes.append(len(self.general_boundary))
+                if self.check_collapse(index, seen):
+                    break
+        instrumentation.extend_series('ce.specific_size', specific_sizes)
+        instrumentation.extend_series('ce.general_size', general_sizes)
+
+        if not self.boundary_prediction:
+            with instrumentation.stage('ce.version_space'):
+                self.version_space_bits = self.gen_version_space()
+            instrumentation.set_counter('ce.version_space_size', len(self.version_space_bits))
+        with instrumentation.stage('ce.compile'):
+            self.compile_version_space()
+        return self.version_space
 
-        for training_example in self.training_data:
-            sample = training_example[0]
-            result = training_example[1]
-
-            # positive example
-            if result == 1:
-                # remove from G any hypothesis that is inconsistent
-                self.max_general = remove_not_matching(self.max_general, sample)
-                copy_of_max_specific = self.max_specific[:]
-                # for each hypothesis s in S
-                for s in self.max_specific:
-                    # that is inconsistent
-                    if not match(s, sample):
-                        # remove s from S
-                        copy_of_max_specific.remove(s)
-                        # add to S all minimal generalizations h of s such that h consistent with d
-                        # and some member of G is more general than h
-                        generalization = get_min_generalization(s, sample)
-                        if process_generalization(generalization, self.max_general):
-                            copy_of_max_specific.append(generalization)
-
-                self.max_specific = copy_of_max_specific[:]
-
-            # negative example
-            elif result == 0:
-                # remove from S any hypothesis that is inconsistent
-                self.max_specific = remove_matching(self.max_specific, sample)
-                new_max_generic = self.max_general[:]
-                # for each hypothesis g in G
-                for g in self.max_general:
-                    # that is inconsistent
-                    if match(g, sample):
-                        # remove g from G
-                        new_max_generic.remove(g)
-                    # add to G all minimal specializations h of g such that h consistent with d
-                    # and some member of S is more specific than h
-                    specializations = get_min_specializations(g, sample)
-                    specializations = self.process_specializations(specializations, self.max_specific)
-                    new_max_generic += specializations
-
-                self.max_general = new_max_generic[:]
-
-                self.max_general = remove_more_specific(self.max_general)
-
-            # wrong example
-            else:
-                # Should not happen
-                print("Error! Wrong result")
+    def process_example(self, sample, result):
+        """
+        Update S and G with a single training example (one step of candidate_elimination)
+        :param sample: packed instance - integer
+        :param result: 1 for a positive example, 0 for a negative one
+        """
+        codec = self.codec
+
+        # positive example
+        if result == 1:
+            # remove from G any hypothesis that is inconsistent
+            for g in self.general_boundary:
+                if not codec.match(g, sample):
+                    self.general_boundary.discard(g)
+            generalizations = []
+            # for each hypothesis s in S that is inconsistent
+            for s in self.specific_boundary:
+                if codec.match(s, sample):
+                    continue
+                # remove s from S and add to S all minimal generalizations h of s such that
+                # h consistent with d and some member of G is more general than h
+                self.specific_boundary.discard(s)
+                generalization = codec.min_generalization(s, sample)
+                if self.process_generalization(generalization, self.general_boundary):
+                    generalizations.append(generalization)
+
+            for generalization in generalizations:
+                self.specific_boundary.add(generalization)
+
+        # negative example
+        elif result == 0:
+            # remove from S any hypothesis that is inconsistent
+            for s in self.specific_boundary:
+                if codec.match(s, sample):
+                    self.specific_boundary.discard(s)
+            new_max_generic = []
+            specializations = []
+            # for each hypothesis g in G
+            for g in self.general_boundary:
+                if not codec.match(g, sample):
+                    new_max_generic.append(g)
+                    continue
+                # that is inconsistent, remove g from G and add to G all minimal specializations h of g
+                # such that h consistent with d and some member of S is more specific than h
+                specializations += self.min_specializations(g, sample)
+
+            self.general_boundary = self.remove_more_specific(new_max_generic + specializations)
 
-        self.version_space = self.gen_version_space()
+        # wrong example
+        else:
+            # Should not happen
+            print("Error! Wrong result")
+
+    def update(self, data, target):
+        """
+        Fold new labelled examples into the trained boundaries: S and G are updated one example at a time
+        and the version space is refreshed only for the members of S and G that changed.
+        Examples with codes outside the attribute domains extend them, and the boundaries are trained again.
+        After a collapse (or in beam mode, exhaustion) the examples are only stored: S and G stay unchanged.
+        :param data: list of list or 2D array - encoded records - example [[0, 0, 0, 0], [0, 1, 0, 0]]
+        :param target: list or array of results - example [1, 0]
+        :return: version space
+        """
+        new_values = np.asarray(data).reshape(-1, self.num_attributes)
+        new_target = np.asarray(target)
+        if not len(new_values):
+            return self.version_space
+        self.training_values = np.concatenate([self.training_values, new_values])
+        self.training_target = np.concatenate([self.training_target, new_target])
+        domains = [max(size, int(code) + 1) for size, code in zip(self.domains, new_values.max(axis=0))]
+        max_code = max(domains) - 1
+        if max_code >= self.codec.empty_code:
+            self.widen_codec(max_code)
+        new_bits = self.codec.encode_instances(new_values)
+
+        if domains != self.domains:
+            # G may miss the specializations with the new codes: train again on every example
+            self.domains = domains
+            self.training_bits += new_bits
+            self.general_boundary = BoundarySet([self.codec.most_general()])
+            self.specific_boundary = BoundarySet([self.codec.most_specific()])
+            return self.candidate_elimination()
+
+        old_general = list(self.general_boundary)
+        old_specific = list(self.specific_boundary)
+        record_sizes = instrumentation.ENABLED
+        specific_sizes, general_sizes = [], []
+        start = len(self.training_bits)
+        self.training_bits += new_bits
+        results = self.training_target.tolist()
+        # with the beam, examples are scored against the examples stored before, and replayed by rebuild_boundaries
+        seen = list(range(start))
+        for index in self.training_order(new_target, start):
+            if self.collapsed_at is not None:
+                break
+            self.process_example(self.training_bits[index], results[index])
+            seen.append(index)
+            self.bound_boundaries(seen)
+            if record_sizes:
+                specific_sizes.append(len(self.specific_boundary))
+                general_sizes.append(len(self.general_boundary))
+            self.check_collapse(index, seen)
+        instrumentation.extend_series('ce.specific_size', specific_sizes)
+        instrumentation.extend_series('ce.general_size', general_sizes)
+
+        if not self.boundary_prediction:
+            self.refresh_version_space(old_specific, old_general)
+            instrumentation.set_counter('ce.version_space_size', len(self.version_space_bits))
+        self.compile_version_space()
         return self.version_space
 
-    def process_specializations(self, specializations, max_specific):
+    def widen_codec(self, max_code):
+        """
+        Re-encode boundaries, version space and training examples with fields wide enough for max_code
+        :param max_code: highest attribute code
         """
-        :param specializations: list of tuple - example [('0', '?', '?', '?', '?', '?')]
-        :param max_specific: list of tuple - example [('0', '0', '?', '0', '0', '0')]
-        :return: list of tuple
+        old_codec = self.codec
+        self.codec = BitHypothesisCodec(self.num_attributes, max_code)
 
-        examples:
-        - [('?', '1', '0')] - [('1', '?', '0'), ('?', '1', '0'), ('?', '0', '0')] => [('?', '1', '0')]
-        - [('1', '1', '0')] - [('0', '?', '?'), ('1', '?', '?'), ('?', '0', '?'), ('?', '?', '0'), ('?', '?', '1')]
-            => [('1', '?', '?'), ('?', '?', '0')]
+        def convert(hypotheses):
+            return BoundarySet(self.codec.encode(old_codec.decode(h)) for h in hypotheses)
+
+        self.general_boundary = convert(self.general_boundary)
+        self.specific_boundary = convert(self.specific_boundary)
+        self.version_space_counts = {self.codec.encode(old_codec.decode(h)): count
+                                     for h, count in self.version_space_counts.items()}
+        self.version_space_bits = list(self.version_space_counts)
+        # the examples being added are packed by update
+        self.training_bits = self.codec.encode_instances(self.training_values[:len(self.training_bits)])
+
+    def process_generalization(self, generalization, max_generic):
         """
+        :param generalization: packed hypothesis - (mask, value)
+        :param max_generic: BoundarySet of G
+        :return: True if G is empty or some member of G is more general than generalization
+        """
+        if not max_generic:
+            return True
+        return max_generic.has_more_general(generalization)
 
-        valid_specializations = []
-        for s in max_specific:
-            for hyp in specializations:
-                if more_general(hyp, s):
-                    valid_specializations.append(hyp)
-                elif s == [tuple(['*' for factor in range(self.numFactors)])][0]:
-                    valid_specializations.append(hyp)
-        return valid_specializations
+    def min_specializations(self, g, sample):
+        """
+        Minimal specializations h of g that do not match sample and such that some member of S is more specific
+        than h. Candidates are pruned against S before they are built:
+        - a member of S that covers nothing (the initial '*' hypothesis) is more specific than any h,
+          so every code of each attribute domain except the sample one is a candidate
+        - otherwise h must fix a '?' field of g to the code of a member s of S more specific than g,
+          so only those codes are tried
+        :param g: packed hypothesis of G matching sample
+        :param sample: packed negative example - integer
+        :return: list of packed hypotheses
+
+        examples with 3 attributes of domains [2, 3, 2]:
+        - ('?', '?', '?') - ('1', '0', '1') - S [('*', '*', '*')]
+            => [('0', '?', '?'), ('?', '1', '?'), ('?', '2', '?'), ('?', '?', '0')]
+        - ('?', '?', '?') - ('1', '0', '1') - S [('0', '2', '?')] => [('0', '?', '?'), ('?', '2', '?')]
+        """
+        codec = self.codec
+        if any(codec.covers_nothing(s) for s in self.specific_boundary):
+            return codec.min_specializations(g, sample, self.domains)
+        covered = self.specific_boundary.more_specific_members(g)
+
+        mask, value = g
+        specializations = {}
+        for s_mask, s_value in covered:
+            # fields constrained by s, free in g and with a code different from the sample one
+            fields = s_mask & ~mask & codec.spread((s_value ^ sample) & s_mask)
+            for field in codec.field_masks:
+                if fields & field:
+                    specializations[(mask | field, value | (s_value & field))] = None
+        return list(specializations)
+
+    def remove_more_specific(self, hypotheses):
+        """
+        :param hypotheses: list of packed hypotheses
+        :return: BoundarySet without the hypotheses that are more specific than another one
+        """
+        boundary = BoundarySet()
+        for hypothesis in hypotheses:
+            boundary.add_maximal(hypothesis)
+        return boundary
 
     def gen_version_space(self):
         """
         For each tuple of S and for each tuple of G, add to 'attributes' list S's element if
         position indices are equal. Otherwise add G's element.
+        Every member keeps the number of S, G and (s, g) entries generating it, see refresh_version_space.
         :param: None
-        :return: version space - list
+        :return: version space - list of packed hypotheses
         """
+        specific, general = set(self.specific_boundary), set(self.general_boundary)
+        self.version_space_counts = {}
         # add to version space all instances of G and S
-        for i in self.max_general:
-            self.version_space.append(i)
-        for i in self.max_specific:
-            self.version_space.append(i)
+        self.change_version_space(list(specific) + list(general), 1)
+        self.change_version_space(self.gen_hybrids(specific, general), 1)
+        return list(self.version_space_counts)
 
-        for s in self.max_specific:
+    def refresh_version_space(self, old_specific, old_general):
+        """
+        Update the version space after S and G changed: only the members generated by removed or added
+        hypotheses (and by their pairs) are counted again.
+        :param old_specific: S before the update - list of packed hypotheses
+        :param old_general: G before the update - list of packed hypotheses
+        """
+        old_specific, old_general = set(old_specific), set(old_general)
+        new_specific, new_general = set(self.specific_boundary), set(self.general_boundary)
+        kept_specific = old_specific & new_specific
+        removed_specific, added_specific = old_specific - new_specific, new_specific - old_specific
+        removed_general, added_general = old_general - new_general, new_general - old_general
+
+        self.change_version_space(list(removed_specific) + list(removed_general), -1)
+        self.change_version_space(self.gen_hybrids(removed_specific, old_general), -1)
+        self.change_version_space(self.gen_hybrids(kept_specific, removed_general), -1)
+        self.change_version_space(list(added_specific) + list(added_general), 1)
+        self.change_version_space(self.gen_hybrids(added_specific, new_general), 1)
+        self.change_version_space(self.gen_hybrids(kept_specific, added_general), 1)
+        self.version_space_bits = list(self.version_space_counts)
+
+    def gen_hybrids(self, specific, general):
+        """
+        :param specific: packed hypotheses of S
+        :param general: packed hypotheses of G
+        :return: generator of the hybrids of every pair (s, g) and every attribute index
+        """
+        for s in specific:
             for i in range(self.num_attributes):
-                for g in self.max_general:
-                    attributes = []
-                    for j in range(self.num_attributes):
-                        if j == i:
-                            attributes.append(s[i])
-                        else:
-                            attributes.append(g[j])
-                    self.version_space.append(tuple(attributes))
-
-        # use 'set' to eliminate duplicate
-        return list(set(self.version_space))
+                for g in general:
+                    yield self.codec.hybrid(s, g, i)
+
+    def change_version_space(self, hypotheses, step):
+        """
+        :param hypotheses: iterable of packed hypotheses
+        :param step: 1 to add an occurrence of each hypothesis, -1 to remove it
+        """
+        counts = self.version_space_counts
+        for hypothesis in hypotheses:
+            count = counts.get(hypothesis, 0) + step
+            if count:
+                counts[hypothesis] = count
+            else:
+                del counts[hypothesis]
+
+    def compile_hypotheses(self, hypotheses):
+        """
+        :param hypotheses: list of packed hypotheses
+        :return:
+        - constrained: bool matrix (hypotheses x attributes) - True where the attribute is not '?'
+        - codes: integer matrix (hypotheses x attributes) - required code, -1 for '*'
+        """
+        constrained = []
+        codes = []
+        for hypothesis in hypotheses:
+            hyp_constrained, hyp_codes = self.codec.unpack(hypothesis)
+            constrained.append(hyp_constrained)
+            codes.append(hyp_codes)
+        shape = (len(hypotheses), self.num_attributes)
+        return np.array(constrained, dtype=bool).reshape(shape), np.array(codes, dtype=np.int64).reshape(shape)
+
+    def compile_version_space(self):
+        """
+        Build the NumPy matrices used by batch_prediction, one row for each version space member:
+        - vs_constrained: True where the attribute is not '?'
+        - vs_codes: required code, -1 for '*'
+        - vs_active: False for members without constrained attributes, that never vote yes
+        With boundary_prediction the same matrices are built for S and G instead.
+        :param: None
+        """
+        if self.boundary_prediction:
+            self.specific_constrained, self.specific_codes = self.compile_hypotheses(self.specific_boundary)
+            self.general_constrained, self.general_codes = self.compile_hypotheses(self.general_boundary)
+            return
+
+        self.vs_constrained, self.vs_codes = self.compile_hypotheses(self.version_space_bits)
+        self.vs_active = self.vs_constrained.any(axis=1)
+
+    def count_matches(self, records, constrained, codes, active=None):
+        """
+        :param records: integer matrix (records x attributes)
+        :param constrained: bool matrix (hypotheses x attributes)
+        :param codes: integer matrix (hypotheses x attributes)
+        :param active: bool array - hypotheses that can match, None for all
+        :return: number of hypotheses matching each record (a record value of -1 is unknown and matches only '?')
+        """
+        counts = np.zeros(len(records), dtype=np.int64)
+        num_hypotheses = len(codes)
+        if not num_hypotheses:
+            return counts
+
+        # a '*' field (code -1) covers nothing, but unknown values of the records are coded -1 too:
+        # hypotheses with a '*' never match, as in prediction
+        coverable = ~(constrained & (codes < 0)).any(axis=1)
+        active = coverable if active is None else active & coverable
+
+        # records are scored in chunks to bound the size of the comparison cube
+        chunk = max(1, BATCH_BLOCK_SIZE // (num_hypotheses * max(1, self.num_attributes)))
+        free = ~constrained
+        for start in range(0, len(records), chunk):
+            block = records[start:start + chunk]
+            matches = ((block[:, None, :] == codes[None, :, :]) | free[None, :, :]).all(axis=2)
+            matches &= active[None, :]
+            counts[start:start + chunk] = matches.sum(axis=1)
+        return counts
+
+    def boundary_votes(self, specific_yes, general_yes):
+        """
+        Classify with the boundaries only:
+        - positive if every member of S covers the record
+        - negative if no member of G covers the record
+        - otherwise positive if more than half of the members of S and G cover it
+        :param specific_yes: number of S members covering each record - int or array
+        :param general_yes: number of G members covering each record - int or array
+        :return: 1 if is True or 0 otherwise (an array for arrays)
+        """
+        num_specific = len(self.specific_boundary)
+        num_general = len(self.general_boundary)
+        votes = np.where(2 * (specific_yes + general_yes) > num_specific + num_general, 1, 0)
+        if num_specific:
+            votes = np.where(specific_yes == num_specific, 1, votes)
+        return np.where(general_yes == 0, 0, votes)
+
+    def batch_prediction(self, data):
+        """
+        Vectorized version of prediction for many records.
+        :param data: list of list or 2D array - example [[0, 0, 0, 0], [0, 1, 0, 0]]
+        :return: array of votes - 1 if is True or 0 otherwise for each record
+        """
+        records = np.asarray(data, dtype=np.int64).reshape(-1, self.num_attributes)
+        if self.boundary_prediction:
+            specific_yes = self.count_matches(records, self.specific_constrained, self.specific_codes)
+            general_yes = self.count_matches(records, self.general_constrained, self.general_codes)
+            return self.boundary_votes(specific_yes, general_yes)
+
+        classification_yes = self.count_matches(records, self.vs_constrained, self.vs_codes, self.vs_active)
+        return (2 * classification_yes > len(self.vs_codes)).astype(np.int64)
 
     def prediction(self, new_data):
         """
@@ -341,25 +813,25 @@ class CalcCandidateElimination:
         <Sunny, Warm, ?, Strong, ?, ?> - <Sunny, Warm, Normal, Strong, Cool, Change> - classification_yes
         <Sunny, Warm, ?, Strong, ?, ?> - <Rainy, Cold, normal, Light, Warm, Same>    - classification_no
 
+        A version space member without constrained attributes counts as classification_no.
+        With boundary_prediction S and G are used instead (see boundary_votes).
         """
-        new_record = new_data[0]
-        new_record_dict = dict(enumerate(new_record))
+        new_record = self.codec.encode_instance(new_data[0])
+        unknown = self.codec.unknown_fields(new_data[0])
+
+        def covers(mask, value):
+            return not mask & unknown and new_record & mask == value
+
+        if self.boundary_prediction:
+            specific_yes = sum(1 for s in self.specific_boundary if covers(*s))
+            general_yes = sum(1 for g in self.general_boundary if covers(*g))
+            return int(self.boundary_votes(specific_yes, general_yes))
+
         classification_yes = 0
-        classification_no = 0
-
-        for instance in self.version_space:
-            classification = False
-            for index, attr in enumerate(instance):
-                if attr != '?':
-                    if str(new_record_dict[index]) == str(attr):
-                        classification = True
-                    else:
-                        classification = False
-                        break
-            if classification:
+        for mask, value in self.version_space_bits:
+            if mask and covers(mask, value):
                 classification_yes += 1
-            else:
-                classification_no += 1
+        classification_no = len(self.version_space_bits) - classification_yes
 
         if classification_yes > classification_no:
             return 1
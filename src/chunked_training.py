@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+from src import support_functions
+from src.naive_bayes import CalcNaiveBayes
+from src.support_vector import CalcSupportVector, DEFAULT_MAX_PASSES
+
+
+def file_blocks(path, block_size=support_functions.DEFAULT_BLOCK_SIZE):
+    """
+    :param path: data training file - string
+    :param block_size: number of rows of each block
+    :return: generator of (values, target) blocks read and encoded from the file, one block in memory at a time
+    """
+    _, _, blocks = support_functions.stream_data(path, block_size)
+    return blocks
+
+
+def dataset_blocks(dataset, block_size=support_functions.DEFAULT_BLOCK_SIZE):
+    """
+    :param dataset: Dataset - with a memory-mapped Dataset (see Dataset.load) only the rows of a block are paged in
+    :param block_size: number of rows of each block
+    :return: generator of (values, target) slices of dataset
+    """
+    for start in range(0, len(dataset), block_size):
+        yield dataset.values[start:start + block_size], dataset.target[start:start + block_size]
+
+
+def train_file(path, block_size=support_functions.DEFAULT_BLOCK_SIZE, max_passes=DEFAULT_MAX_PASSES):
+    """
+    Train Naive Bayes and Support Vector streaming a data training file from disk: only one block of rows is in
+    memory at a time, every pass reads the file again
+    :param path: data training file - string
+    :param block_size: number of rows of each block
+    :param max_passes: max passes of Support Vector over the file
+    :return: dictionary with keys nb, sv (trained classifiers), header, code_tables and records
+    """
+    header, code_tables, blocks = support_functions.stream_data(path, block_size)
+    nb = CalcNaiveBayes()
+    # code_tables are complete once the blocks are consumed
+    records = nb.training_blocks(blocks)
+    sv = CalcSupportVector()
+    sv.training_blocks(lambda: file_blocks(path, block_size), len(header), max_passes)
+    return {'nb': nb, 'sv': sv, 'header': header, 'code_tables': code_tables, 'records': records}
+
+
+def block_accuracy(classifier, blocks):
+    """
+    :param classifier: trained classifier
+    :param blocks: iterable of (values, target)
+    :return: fraction of records predicted correctly
+    """
+    correct = 0
+    total = 0
+    for data, target in blocks:
+        if len(target):
+            correct += int(np.count_nonzero(classifier.prediction(data) == target))
+            total += len(target)
+    return correct / total if total else 0.0
+
+
+def parity_report(paths, block_size=support_functions.DEFAULT_BLOCK_SIZE, max_passes=DEFAULT_MAX_PASSES):
+    """
+    Accuracy on the data training of Naive Bayes and Support Vector trained in memory (fit on all the records)
+    and streaming the file (see train_file). Unlike train_file, the whole file is read in memory.
+    :param paths: data training files - list
+    :param block_size: number of rows of each block
+    :param max_passes: max passes of Support Vector over the file
+    :return: list of dictionaries with keys name, records and, for nb and sv, (in memory, chunked) accuracy
+    """
+    from src.dataset import Dataset
+
+    report = []
+    for path in paths:
+        dataset = Dataset.read(path, block_size)
+
+        in_memory = {'nb': CalcNaiveBayes(), 'sv': CalcSupportVector()}
+        for classifier in in_memory.values():
+            classifier.training(dataset.values, dataset.target)
+        chunked = train_file(path, block_size, max_passes)
+
+        row = {'name': os.path.splitext(os.path.basename(path))[0], 'records': len(dataset)}
+        for key in ('nb', 'sv'):
+            row[key] = (block_accuracy(in_memory[key], dataset_blocks(dataset, block_size)),
+                        block_accuracy(chunked[key], dataset_blocks(dataset, block_size)))
+        report.append(row)
+    return report
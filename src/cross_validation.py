@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src import instrumentation
+from src import support_functions
+from src import training
+from src.defaults import DEFAULT_FOLDS
+
+# encoded data set of this process, set by share_arrays (workers) or directly (sequential run)
+dataset = {}
+
+
+def fold_indexes(target, folds=DEFAULT_FOLDS, stratified=False, seed=0):
+    """
+    Split the records in folds of (almost) the same size, after a random shuffle
+    :param target: results - array of 1 or 0
+    :param folds: number of folds
+    :param stratified: keep the proportion of true and false results of the whole data set in every fold
+    :param seed: random seed of the shuffle
+    :return: list of arrays with the record indexes of each test fold
+    """
+    target = np.asarray(target)
+    if not 2 <= folds <= len(target):
+        raise ValueError("Number of folds must be between 2 and the number of records ({})".format(len(target)))
+
+    rng = np.random.RandomState(seed)
+    if not stratified:
+        return np.array_split(rng.permutation(len(target)), folds)
+
+    # deal the shuffled records of each class to the folds in turn, so every fold gets its share of each class
+    test_folds = [[] for _ in range(folds)]
+    position = 0
+    for value in np.unique(target):
+        indexes = rng.permutation(np.flatnonzero(target == value))
+        for index in indexes:
+            test_folds[position % folds].append(index)
+            position += 1
+    return [np.sort(np.array(indexes, dtype=np.int64)) for indexes in test_folds]
+
+
+def share_arrays(descriptions, domains=None):
+    """
+    Worker initializer: attach the encoded data set stored in shared memory, as read-only arrays
+    :param descriptions: dictionary name -> (shared memory name, shape, dtype)
+    :param domains: number of codes of each attribute (see Dataset.domains)
+    """
+    dataset['domains'] = domains
+    for name, (memory_name, shape, dtype) in descriptions.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        array.flags.writeable = False
+        dataset[name] = array
+        # keep the mapping alive as long as the array
+        dataset[name + '_memory'] = memory
+
+
+def evaluate_fold(test_indexes, instrumented=False):
+    """
+    Train the members on every record out of the fold and score them on the fold
+    :param test_indexes: record indexes of the test fold - array
+    :param instrumented: record instrumentation in this (worker) process and return it
+    :return:
+    - confusion matrix of the fold (see support_functions.calc_confusion_matrix)
+    - instrumentation snapshot when instrumented, None otherwise
+    """
+    if instrumented:
+        instrumentation.reset()
+        instrumentation.enable()
+    data, target = dataset['data'], dataset['target']
+    train_mask = np.ones(len(target), dtype=bool)
+    train_mask[test_indexes] = False
+
+    with instrumentation.stage('cross_validation.fold'):
+        # domains of the whole data set: codes seen only in the test fold still get their specializations
+        classifiers = {}
+        for key, train_function in training.member_functions(dataset.get('domains')):
+            with instrumentation.stage('train.' + key):
+                classifiers[key] = train_function(data[train_mask], target[train_mask])
+        confusion_matrix = support_functions.calc_confusion_matrix(data[test_indexes], target[test_indexes],
+                                                                   classifiers['nb'], classifiers['ce'],
+                                                                   classifiers['sv'])
+    return confusion_matrix, instrumentation.snapshot() if instrumented else None
+
+
+def sum_confusion_matrices(confusion_matrices):
+    """
+    :param confusion_matrices: list of confusion matrices, one for each fold
+    :return: confusion matrix with the counts of all folds
+    """
+    total = {}
+    for confusion_matrix in confusion_matrices:
+        for key, counts in confusion_matrix.items():
+            total_counts = total.setdefault(key, {'tn': 0, 'fp': 0, 'fn': 0, 'tp': 0})
+            for name, value in counts.items():
+                total_counts[name] += value
+    return total
+
+
+def cross_validate(data, target, folds=DEFAULT_FOLDS, stratified=False, workers=None, seed=0, domains=None):
+    """
+    k-fold cross validation of the ensemble members. The encoded data set is copied once in shared memory and
+    every worker process reads it from there; each fold trains and scores all three members.
+    :param data: encoded records - 2D integer array
+    :param target: results - array of 1 or 0
+    :param folds: number of folds
+    :param stratified: see fold_indexes
+    :param workers: number of processes - default: number of cores, 1 runs the folds in this process
+    :param seed: random seed of the folds
+    :param domains: number of codes of each attribute (see Dataset.domains) - default: from the codes of each fold
+    :return:
+    - confusion_matrix: counts of all folds, ready for support_functions.calc_indexes
+    - fold_matrices: list of confusion matrices of each fold
+    """
+    data = np.ascontiguousarray(data)
+    target = np.ascontiguousarray(target)
+    test_folds = fold_indexes(target, folds, stratified, seed)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, folds)
+
+    if workers <= 1:
+        dataset.update(data=data, target=target, domains=domains)
+        try:
+            fold_matrices = [evaluate_fold(indexes)[0] for indexes in test_folds]
+        finally:
+            dataset.clear()
+        return sum_confusion_matrices(fold_matrices), fold_matrices
+
+    memories = []
+    try:
+        descriptions = {}
+        for name, array in (('data', data), ('target', target)):
+            memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            memories.append(memory)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            descriptions[name] = (memory.name, array.shape, array.dtype.str)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=share_arrays,
+                                 initargs=(descriptions, domains)) as executor:
+            # measures of the workers are sent back and merged into the ones of this process
+            instrumented = instrumentation.ENABLED
+            fold_matrices = []
+            for confusion_matrix, recorded in executor.map(evaluate_fold, test_folds,
+                                                           [instrumented] * len(test_folds)):
+                fold_matrices.append(confusion_matrix)
+                if recorded is not None:
+                    instrumentation.merge(recorded)
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    return sum_confusion_matrices(fold_matrices), fold_matrices
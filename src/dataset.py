@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+from src import instrumentation
+from src import support_functions
+
+# encoded cache stored beside each data training file: '<file name>.encoded'
+ENCODED_SUFFIX = '.encoded'
+ENCODED_MAGIC = b'ENSEMBLE-ENCODED'
+ENCODED_VERSION = 1         # bump when the layout changes, so old files are rebuilt
+ENCODED_ALIGNMENT = 64      # byte alignment of the arrays in the file
+
+
+def file_digest(path):
+    """
+    :param path: file path - string
+    :return: SHA-256 of the file content - hex string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def aligned(offset):
+    return -(-offset // ENCODED_ALIGNMENT) * ENCODED_ALIGNMENT
+
+
+def code_dtype(max_code):
+    """
+    :param max_code: highest attribute code
+    :return: smallest signed integer dtype holding every code (signed, so unknown values can be coded -1)
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if max_code <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class Dataset:
+    """
+    Encoded data training, the single form of the records shared by the classifiers and the evaluation:
+    - values: matrix records x attributes of attribute codes, with the smallest integer type that fits them
+    - target: array of results (1 or 0)
+    - header: attributes names, in the order of the columns of values
+    - code_tables: dictionary attribute -> {real value: code}, 'result' included (the 'total_values')
+    """
+
+    def __init__(self, values, target, header, code_tables):
+        values = np.asarray(values)
+        max_code = int(values.max()) if values.size else 0
+        self.values = np.ascontiguousarray(values, dtype=code_dtype(max_code)).reshape(-1, len(header))
+        self.target = np.ascontiguousarray(target, dtype=np.int8)
+        self.header = list(header)
+        self.code_tables = code_tables
+
+    @classmethod
+    @instrumentation.timed('read_dataset')
+    def read(cls, path, block_size=support_functions.DEFAULT_BLOCK_SIZE):
+        """
+        Read and encode a training file (CSV or Excel) one block at a time
+        :param path: string
+        :param block_size: number of rows encoded at a time
+        :return: Dataset
+        """
+        header, code_tables, blocks = support_functions.stream_data(path, block_size)
+        values_blocks = []
+        target_blocks = []
+        for values, results in blocks:
+            values_blocks.append(values)
+            target_blocks.append(results.astype(np.int8))
+
+        if not values_blocks:
+            return cls(np.empty((0, len(header)), dtype=np.int8), np.empty(0, dtype=np.int8), header, code_tables)
+        return cls(np.concatenate(values_blocks), np.concatenate(target_blocks), header, code_tables)
+
+    @classmethod
+    def load(cls, path, block_size=support_functions.DEFAULT_BLOCK_SIZE, use_cache=True):
+        """
+        Dataset of a training file, memory-mapped from the encoded cache beside it when the cache is up to date.
+        Otherwise the file is read and encoded, and the cache written (if the directory is writable).
+        :param path: data training file - string
+        :param block_size: number of rows encoded at a time
+        :param use_cache: False to always read the file, without touching the cache
+        :return: Dataset
+        """
+        if not use_cache:
+            return cls.read(path, block_size)
+        dataset = cls.load_encoded(path)
+        if dataset is not None:
+            instrumentation.count('dataset.cache_hits')
+            return dataset
+
+        dataset = cls.read(path, block_size)
+        try:
+            dataset.store_encoded(path)
+        except OSError:
+            # read-only directory: the cache is only an optimization
+            pass
+        return dataset
+
+    @classmethod
+    @instrumentation.timed('load_encoded')
+    def load_encoded(cls, path):
+        """
+        Memory-map the encoded cache of a training file. The cache is valid when the size and mtime of the file
+        did not change, or, if only the mtime changed, when the file content has the same hash.
+        :param path: data training file - string
+        :return: Dataset with read-only arrays backed by the cache file, None if the cache is missing or stale
+        """
+        cache_path = path + ENCODED_SUFFIX
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                if cache_file.read(len(ENCODED_MAGIC)) != ENCODED_MAGIC:
+                    return None
+                header_size, = struct.unpack('<Q', cache_file.read(8))
+                info = json.loads(cache_file.read(header_size).decode('utf-8'))
+            source = os.stat(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+        if info.get('version') != ENCODED_VERSION or info['source_size'] != source.st_size:
+            return None
+        if info['source_mtime_ns'] != source.st_mtime_ns:
+            if info['source_sha256'] != file_digest(path):
+                return None
+
+        arrays = {}
+        for name in ('values', 'target'):
+            layout = info[name]
+            shape = tuple(layout['shape'])
+            if not np.prod(shape):
+                arrays[name] = np.empty(shape, dtype=layout['dtype'])
+                continue
+            arrays[name] = np.memmap(cache_path, dtype=layout['dtype'], mode='r', offset=layout['offset'],
+                                     shape=shape)
+        code_tables = {key: {value: code for value, code in pairs} for key, pairs in info['code_tables']}
+        dataset = cls(arrays['values'], arrays['target'], info['header'], code_tables)
+
+        if info['source_mtime_ns'] != source.st_mtime_ns:
+            # same content with a new mtime: store it, so the next run does not hash the file again
+            try:
+                dataset.store_encoded(path, info['source_sha256'])
+            except OSError:
+                pass
+        return dataset
+
+    @instrumentation.timed('store_encoded')
+    def store_encoded(self, path, digest=None):
+        """
+        Write the encoded cache of a training file: a header (JSON) with the stat and hash of the file, header and
+        code tables, followed by the raw values and target arrays
+        :param path: data training file - string
+        :param digest: SHA-256 of the file content, computed if None
+        """
+        source = os.stat(path)
+        header_offset = len(ENCODED_MAGIC) + 8
+        arrays = [('values', np.ascontiguousarray(self.values)), ('target', np.ascontiguousarray(self.target))]
+        info = {'version': ENCODED_VERSION, 'source_size': source.st_size, 'source_mtime_ns': source.st_mtime_ns,
+                'source_sha256': digest or file_digest(path), 'header': self.header,
+                # pairs keep the type of the values (numbers read from Excel files are not strings)
+                'code_tables': [[key, list(table.items())] for key, table in self.code_tables.items()]}
+        # offsets depend on the header size, which depends on the offsets: reserve room for them first
+        for name, array in arrays:
+            info[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': 0}
+        header = json.dumps(info).encode('utf-8')
+        offset = aligned(header_offset + len(header) + 64)
+        for name, array in arrays:
+            info[name]['offset'] = offset
+            offset = aligned(offset + array.nbytes)
+        header = json.dumps(info).encode('utf-8')
+
+        cache_path = path + ENCODED_SUFFIX
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as cache_file:
+            cache_file.write(ENCODED_MAGIC + struct.pack('<Q', len(header)) + header)
+            for name, array in arrays:
+                cache_file.seek(info[name]['offset'])
+                cache_file.write(array.tobytes())
+        os.replace(tmp_path, cache_path)
+
+    @classmethod
+    def from_records(cls, data, header):
+        """
+        :param data: list of dictionaries as returned by support_functions.read_data
+        :param header: attributes names - list
+        :return: Dataset
+        """
+        values, results, code_tables = support_functions.encode_data(data, header)
+        return cls(values, results, header, code_tables)
+
+    def __len__(self):
+        return len(self.target)
+
+    def __repr__(self):
+        return 'Dataset({} records, {} attributes, {})'.format(len(self), self.num_attributes, self.values.dtype)
+
+    @property
+    def num_attributes(self):
+        return len(self.header)
+
+    @property
+    def domains(self):
+        """
+        :return: number of codes of each attribute, from the code tables - example [3, 2, 4]
+        """
+        return [len(self.code_tables[name]) for name in self.header]
+
+    def subset(self, indexes):
+        """
+        :param indexes: record indexes or boolean mask - array
+        :return: Dataset with the selected records, sharing header and code tables
+        """
+        return Dataset(self.values[indexes], self.target[indexes], self.header, self.code_tables)
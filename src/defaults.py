@@ -0,0 +1,13 @@
+# Default values shown by the command line help. They are kept in this module, without imports, so that
+# ensemble_learning.py can show them without importing NumPy and the modules that use them.
+
+DEFAULT_BLOCK_SIZE = 10000          # rows read, encoded or scored together
+DEFAULT_FOLDS = 10                  # folds of the cross validation
+DEFAULT_MAX_TABLE_SIZE = 1 << 20    # records of the input space precomputed at most by the prediction table
+DEFAULT_MAX_PASSES = 50             # passes over the row blocks of the chunked Support Vector training
+
+# prediction service
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_WINDOW = 0.005      # seconds a batch waits for more requests after the first one
+DEFAULT_MAX_BATCH = 4096    # records
@@ -0,0 +1,168 @@
+import time
+
+import numpy as np
+
+from src import instrumentation
+from src import training
+
+# weight of the running average of the prediction cost given to the last measure
+COST_SMOOTHING = 0.2
+
+
+def parse_weights(text):
+    """
+    :param text: comma separated member weights - example 'nb=1,ce=0.5,sv=2'
+    :return: dictionary - example {'nb': 1.0, 'ce': 0.5, 'sv': 2.0}
+    """
+    weights = {}
+    for item in text.split(','):
+        key, separator, value = item.partition('=')
+        if not separator:
+            raise ValueError("Weight '{}' is not in the form member=weight".format(item))
+        weights[key.strip()] = float(value)
+    return weights
+
+
+class Ensemble:
+    """
+    Weighted majority judge of the ensemble members.
+
+    The verdict is True when the weight of the members voting True is more than half of the total weight
+    (with unit weights this is the majority of scoring.judge). Members are evaluated cheapest-first, by their
+    measured average prediction time per record, and evaluation stops as soon as the remaining members can no
+    longer change the verdict (short-circuit).
+    """
+
+    def __init__(self, members, weights=None):
+        """
+        :param members: list of (key, classifier) - example [('nb', CalcNaiveBayes), ('ce', ...), ('sv', ...)]
+        :param weights: dictionary key -> weight, 1 for missing members - example {'sv': 2}
+        """
+        self.keys = [key for key, _ in members]
+        self.classifiers = dict(members)
+        weights = weights or {}
+        unknown = set(weights) - set(self.keys)
+        if unknown:
+            raise ValueError("Unknown members in weights: {}".format(", ".join(sorted(unknown))))
+        self.weights = {key: float(weights.get(key, 1)) for key in self.keys}
+        if any(weight < 0 for weight in self.weights.values()):
+            raise ValueError("Member weights cannot be negative")
+        self.total_weight = sum(self.weights.values())
+        self.costs = {key: None for key in self.keys}      # average seconds per record
+        self.evaluations = {key: 0 for key in self.keys}   # records predicted by each member
+        self.decisions = 0
+        self.short_circuits = 0     # decisions taken before every member voted
+
+    @classmethod
+    def from_trained(cls, trained, weights=None):
+        """
+        :param trained: trained ensemble (see training.load_ensemble)
+        :param weights: see __init__
+        :return: Ensemble of the members of training.MEMBERS
+        """
+        return cls([(key, trained[key]) for key, _, _ in training.MEMBERS], weights)
+
+    def order(self):
+        """
+        :return: member keys sorted by average prediction cost, members never measured first
+        """
+        return sorted(self.keys, key=lambda key: -1.0 if self.costs[key] is None else self.costs[key])
+
+    def member_votes(self, key, records):
+        """
+        Predict records with a single member and update its average cost
+        :param key: member key
+        :param records: encoded records - 2D array
+        :return: array of 1 or 0
+        """
+        classifier = self.classifiers[key]
+        start = time.perf_counter()
+        with instrumentation.stage('predict.' + key):
+            if len(records) > 1 and hasattr(classifier, 'batch_prediction'):
+                votes = classifier.batch_prediction(records)
+            else:
+                # a single record of Candidate Elimination: the packed prediction is faster than the NumPy one
+                votes = np.asarray(classifier.prediction(records)).reshape(-1)
+        cost = (time.perf_counter() - start) / len(records)
+
+        previous = self.costs[key]
+        self.costs[key] = cost if previous is None else (1 - COST_SMOOTHING) * previous + COST_SMOOTHING * cost
+        self.evaluations[key] += len(records)
+        return votes
+
+    def decide(self, record):
+        """
+        Verdict for a single record
+        :param record: encoded record - list - example [0, 1, 0, 0]
+        :return:
+        - verdict: 1 if is True or 0 otherwise
+        - votes: dictionary with the vote of each evaluated member - example {'ce': 1, 'nb': 1}
+        """
+        verdicts, votes = self.predict([record], with_votes=True)
+        return int(verdicts[0]), {key: int(member_votes[0]) for key, member_votes in votes.items()
+                                  if member_votes[0] >= 0}
+
+    def predict(self, data, with_votes=False):
+        """
+        Vectorized short-circuit verdicts: every member only predicts the records that are still undecided
+        :param data: encoded records - list of list or 2D array
+        :param with_votes: also return the votes of the members
+        :return:
+        - verdicts: array - 1 if is True or 0 otherwise for each record
+        - votes (with_votes only): dictionary key -> array of votes, -1 where the member was not evaluated
+        """
+        records = np.asarray(data)
+        num_records = len(records)
+        verdicts = np.zeros(num_records, dtype=np.int64)
+        yes_weight = np.zeros(num_records)
+        votes = {}
+        undecided = np.arange(num_records)
+        remaining = self.total_weight
+        order = self.order()
+
+        for step, key in enumerate(order):
+            if not len(undecided):
+                break
+            member_votes = self.member_votes(key, records[undecided])
+            if with_votes:
+                votes[key] = np.full(num_records, -1, dtype=np.int64)
+                votes[key][undecided] = member_votes
+            remaining -= self.weights[key]
+            yes_weight[undecided] += self.weights[key] * (member_votes == 1)
+
+            # decided True: already more than half; decided False: cannot get more than half anymore
+            current = yes_weight[undecided]
+            is_true = 2 * current > self.total_weight
+            decided = is_true | (2 * (current + remaining) <= self.total_weight)
+            if step == len(order) - 1:
+                decided[:] = True
+            else:
+                self.short_circuits += int(np.count_nonzero(decided))
+            verdicts[undecided[decided]] = is_true[decided]
+            undecided = undecided[~decided]
+
+        self.decisions += num_records
+        if with_votes:
+            return verdicts, votes
+        return verdicts
+
+    def vote(self, results):
+        """
+        Weighted vote on the results of every member
+        :param results: matrix records x members (columns ordered as the members) of 1 or 0, or a single row
+        :return: 1 if is True or 0 otherwise (an array for a matrix)
+        """
+        results = np.asarray(results)
+        weights = np.array([self.weights[key] for key in self.keys])
+        yes_weight = ((results == 1) * weights).sum(axis=-1)
+        return (2 * yes_weight > self.total_weight).astype(int)
+
+    def stats(self):
+        """
+        :return: dictionary with the number of decisions, how many were short-circuited, records predicted by
+        each member and average cost of each member (microseconds per record)
+        """
+        return {'decisions': self.decisions, 'short_circuits': self.short_circuits,
+                'short_circuit_rate': self.short_circuits / self.decisions if self.decisions else 0.0,
+                'evaluations': dict(self.evaluations),
+                'cost_us': {key: None if cost is None else cost * 1e6 for key, cost in self.costs.items()}}
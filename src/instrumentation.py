@@ -0,0 +1,180 @@
+"""
+Opt-in run instrumentation: per-stage wall/CPU time, counters and series of values, dumped as JSON.
+
+Nothing is recorded until enable() is called; hot loops check ENABLED before doing any work,
+so the disabled overhead is a single attribute lookup.
+"""
+import contextlib
+import cProfile
+import functools
+import json
+import time
+
+ENABLED = False
+
+stages = {}     # name -> {'calls': int, 'wall_s': float, 'cpu_s': float}
+counters = {}   # name -> number
+gauges = set()  # names of the counters holding a value (set_counter) instead of a count
+series = {}     # name -> list of numbers
+
+profiler = None
+
+
+def enable(profile=False):
+    """
+    Start recording
+    :param profile: also run cProfile until dump()
+    """
+    global ENABLED, profiler
+    ENABLED = True
+    if profile and profiler is None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    stages.clear()
+    counters.clear()
+    gauges.clear()
+    series.clear()
+
+
+def add_stage(name, wall_s, cpu_s=0.0):
+    """
+    Add a measure to a stage
+    :param name: stage name - example 'train.ce'
+    :param wall_s: wall time in seconds
+    :param cpu_s: CPU time in seconds
+    """
+    measures = stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+    measures['calls'] += 1
+    measures['wall_s'] += wall_s
+    measures['cpu_s'] += cpu_s
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Time the block as stage 'name' (nothing is measured when disabled)
+    :param name: stage name - example 'read'
+    """
+    if not ENABLED:
+        yield
+        return
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield
+    finally:
+        add_stage(name, time.perf_counter() - start_wall, time.process_time() - start_cpu)
+
+
+def timed(name):
+    """
+    Decorator: time every call of the function as stage 'name'
+    :param name: stage name - example 'write_charts'
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """
+    :param name: counter name
+    :param value: increment
+    """
+    if ENABLED:
+        counters[name] = counters.get(name, 0) + value
+
+
+def set_counter(name, value):
+    """
+    :param name: counter name
+    :param value: current value (a gauge: merge keeps it instead of adding it)
+    """
+    if ENABLED:
+        counters[name] = value
+        gauges.add(name)
+
+
+def extend_series(name, values):
+    """
+    :param name: series name - example 'ce.general_size'
+    :param values: list of numbers appended to the series
+    """
+    if ENABLED:
+        series.setdefault(name, []).extend(values)
+
+
+def snapshot():
+    """
+    :return: copy of the recorded stages, counters and series (picklable, see merge)
+    """
+    return {'stages': {name: dict(measures) for name, measures in stages.items()},
+            'counters': dict(counters), 'gauges': sorted(gauges),
+            'series': {name: list(values) for name, values in series.items()}}
+
+
+def merge(recorded):
+    """
+    Add measures recorded elsewhere, e.g. in a worker process. Counts are added; a gauge takes the merged value
+    and every merged value is appended to the series of the same name (e.g. one value for each fold)
+    :param recorded: result of snapshot()
+    """
+    if not ENABLED:
+        return
+    for name, measures in recorded['stages'].items():
+        total = stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+        for key, value in measures.items():
+            total[key] += value
+    merged_gauges = set(recorded['gauges'])
+    for name, value in recorded['counters'].items():
+        if name in merged_gauges:
+            counters[name] = value
+            gauges.add(name)
+            series.setdefault(name, []).append(value)
+        else:
+            counters[name] = counters.get(name, 0) + value
+    for name, values in recorded['series'].items():
+        series.setdefault(name, []).extend(values)
+
+
+def report():
+    """
+    :return: dictionary with stages, counters and series
+    """
+    summary = {}
+    for name, values in series.items():
+        if values:
+            summary[name] = {'count': len(values), 'min': min(values), 'max': max(values),
+                             'mean': sum(values) / len(values)}
+    return {'stages': stages, 'counters': counters, 'series_summary': summary, 'series': series}
+
+
+def dump(path, profile_path=None):
+    """
+    Write the report as JSON and, if profiling, the cProfile statistics
+    :param path: JSON file - string
+    :param profile_path: cProfile output file (pstats format) - string or None
+    """
+    global profiler
+    if profiler is not None:
+        profiler.disable()
+        if profile_path:
+            profiler.dump_stats(profile_path)
+        profiler = None
+
+    with open(path, 'w') as report_file:
+        json.dump(report(), report_file, indent=2)
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pickle
+
+# bump when the layout of the cached objects changes, so old entries are ignored
+CACHE_VERSION = '6'
+
+DEFAULT_CACHE_DIR = '.ensemble_cache'
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024    # bytes
+
+
+class ModelCache:
+    """
+    On-disk cache of trained ensembles keyed by the content of the training file.
+
+    Each entry is a pickle file named '<path key>-<content hash>.pkl':
+    - the path key identifies the training file, so a new version of the same file replaces the old entry
+    - the content hash changes as soon as the file changes, so a stale entry is never loaded
+
+    The total size of the cache is capped: least recently used entries (by file mtime) are evicted first.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def entry_name(self, path):
+        """
+        :param path: training file path - string
+        :return:
+        - prefix: key of the training file path
+        - name: cache file name for the current content of the training file
+        """
+        prefix = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        digest = hashlib.sha256(CACHE_VERSION.encode('utf-8'))
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(1 << 20), b''):
+                digest.update(chunk)
+        return prefix, '{}-{}.pkl'.format(prefix, digest.hexdigest())
+
+    def load(self, path):
+        """
+        :param path: training file path - string
+        :return: the cached entry or None if the file was never stored or changed since
+        """
+        prefix, name = self.entry_name(path)
+        entry_path = os.path.join(self.directory, name)
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                entry = pickle.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # corrupted or incompatible entry
+            self.remove(entry_path)
+            return None
+
+        # mark as recently used
+        os.utime(entry_path, None)
+        return entry
+
+    def store(self, path, entry):
+        """
+        :param path: training file path - string
+        :param entry: picklable object - example {'nb': nb, 'ce': ce, 'sv': sv, 'total_values': {...}}
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        prefix, name = self.entry_name(path)
+
+        # old versions of the same training file
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(prefix + '-') and file_name != name:
+                self.remove(os.path.join(self.directory, file_name))
+
+        entry_path = os.path.join(self.directory, name)
+        tmp_path = entry_path + '.tmp'
+        with open(tmp_path, 'wb') as entry_file:
+            pickle.dump(entry, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+
+        self.evict(keep=entry_path)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache size is under max_size
+        :param keep: entry path never removed (the one just stored)
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.pkl'):
+                continue
+            entry_path = os.path.join(self.directory, file_name)
+            stat = os.stat(entry_path)
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if entry_path == keep:
+                continue
+            self.remove(entry_path)
+            total_size -= size
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.pkl'):
+                self.remove(os.path.join(self.directory, file_name))
+
+    @staticmethod
+    def remove(entry_path):
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
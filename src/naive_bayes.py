@@ -1,4 +1,5 @@
-from sklearn.naive_bayes import GaussianNB
+# possible results of the encoded data
+CLASSES = [0, 1]
 
 
 class CalcNaiveBayes:
@@ -6,11 +7,51 @@ class CalcNaiveBayes:
     Naive Bayes class
     """
     def __init__(self):
+        from sklearn.naive_bayes import GaussianNB
         self.model = GaussianNB()
 
     def training(self, data, target):
         self.model.fit(data, target)
 
+    def training_blocks(self, blocks):
+        """
+        Train on an iterator of row blocks with GaussianNB.partial_fit, holding one block in memory at a time.
+        partial_fit takes the variance smoothing (epsilon_) from the first block only, so at the end it is computed
+        again from the statistics of all the rows, as fit does: the model is the one of training, up to rounding.
+        :param blocks: iterable of (values, target) - example support_functions.stream_data blocks
+        :return: number of records seen
+        """
+        import numpy as np
+        from sklearn.naive_bayes import GaussianNB
+        self.model = GaussianNB()
+        num_samples = 0
+        for data, target in blocks:
+            if len(target):
+                self.model.partial_fit(data, target, classes=CLASSES)
+                num_samples += len(target)
+        if not num_samples:
+            return num_samples
+
+        # variance of each attribute over all the rows, from the count, mean and variance of each class
+        counts = self.model.class_count_[:, None]
+        variances = self.model.var_ - self.model.epsilon_
+        mean = (counts * self.model.theta_).sum(axis=0) / num_samples
+        total_variances = (counts * (variances + (self.model.theta_ - mean) ** 2)).sum(axis=0) / num_samples
+        self.model.epsilon_ = self.model.var_smoothing * np.max(total_variances)
+        self.model.var_ = variances + self.model.epsilon_
+        return num_samples
+
+    def update(self, data, target):
+        """
+        Fold new examples into the trained model with GaussianNB.partial_fit
+        :param data: list of list - encoded records
+        :param target: list of results
+        """
+        if hasattr(self.model, 'classes_'):
+            self.model.partial_fit(data, target)
+        else:
+            self.model.partial_fit(data, target, classes=CLASSES)
+
     def prediction(self, data):
         result = self.model.predict(data)
         return result
@@ -0,0 +1,255 @@
+import collections
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src import scoring
+from src.defaults import DEFAULT_HOST, DEFAULT_MAX_BATCH, DEFAULT_PORT, DEFAULT_WINDOW
+
+STATS_HISTORY = 10000       # requests and batches kept for the statistics
+CODE_RANGE = np.iinfo(np.int32)     # codes accepted in the records of a request
+
+
+class PendingRequest:
+    """
+    Records of a single request waiting for the batch they are part of
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.start = time.perf_counter()
+        self.done = threading.Event()
+        self.results = None
+        self.verdicts = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Groups the requests that arrive within 'window' seconds in a single call to the prediction of each
+    classifier, then applies the judge to every record.
+    """
+
+    def __init__(self, trained, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH, table=None):
+        """
+        :param trained: trained ensemble (see training.load_ensemble)
+        :param window: seconds to wait for other requests after the first one of a batch
+        :param max_batch: a batch is processed as soon as it has this number of records
+        :param table: PredictionTable serving the predictions, None to run the classifiers on every batch
+        """
+        self.trained = trained
+        self.table = table
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.latencies = collections.deque(maxlen=STATS_HISTORY)
+        self.batch_sizes = collections.deque(maxlen=STATS_HISTORY)
+        self.num_batches = 0
+        self.num_requests = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def predict(self, values):
+        """
+        Called by request threads: blocks until the batch containing 'values' is processed
+        :param values: encoded records - 2D array
+        :return:
+        - results: matrix records x classifiers
+        - verdicts: judge result of each record
+        """
+        request = PendingRequest(values)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results, request.verdicts
+
+    def run(self):
+        """
+        Batching loop of the worker thread
+        """
+        running = True
+        while running:
+            first = self.queue.get()
+            if first is None:
+                break
+            pending = [first]
+            size = len(first.values)
+            deadline = time.perf_counter() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    running = False
+                    break
+                pending.append(request)
+                size += len(request.values)
+            self.process(pending)
+
+    def process(self, pending):
+        """
+        Predict all records of the pending requests together and hand back the results to each request
+        :param pending: list of PendingRequest
+        """
+        try:
+            values = np.concatenate([request.values for request in pending])
+            if self.table is not None:
+                results, verdicts = self.table.predict(values)
+            else:
+                results = scoring.predict_members(self.trained, values)
+                verdicts = scoring.judge(results)
+        except Exception as error:
+            # do not leave request threads waiting forever
+            for request in pending:
+                request.error = error
+                request.done.set()
+            return
+
+        offset = 0
+        end = time.perf_counter()
+        with self.lock:
+            self.num_batches += 1
+            self.num_requests += len(pending)
+            self.batch_sizes.append(len(values))
+            for request in pending:
+                size = len(request.values)
+                request.results = results[offset:offset + size]
+                request.verdicts = verdicts[offset:offset + size]
+                offset += size
+                self.latencies.append(end - request.start)
+        for request in pending:
+            request.done.set()
+
+    def stats(self):
+        """
+        :return: dictionary with latency percentiles (milliseconds) and batch sizes of the recent requests
+        """
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            stats = {'requests': self.num_requests, 'batches': self.num_batches, 'window_ms': self.window * 1000}
+        if len(latencies):
+            stats.update({'latency_p50_ms': float(np.percentile(latencies, 50)),
+                          'latency_p99_ms': float(np.percentile(latencies, 99)),
+                          'batch_size_mean': float(batch_sizes.mean()),
+                          'batch_size_max': int(batch_sizes.max())})
+        if self.table is not None:
+            stats['lookup'] = self.table.stats()
+        return stats
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+def encode_request(records, header, lookup):
+    """
+    :param records: list of records; each record is either a dict {attribute: real value}
+                    or a list of codes ordered by header
+                    example: [{'Color': 'YELLOW', 'Size': 'SMALL', 'Act': 'STRETCH', 'Age': 'ADULT'}, [0, 0, 0, 1]]
+    :param header: attributes names
+    :param lookup: see scoring.build_lookup
+    :return: encoded records - 2D array
+    """
+    if not isinstance(records, list):
+        raise TypeError("'records' must be a list of records")
+    values = np.empty((len(records), len(header)), dtype=np.int32)
+    for row_idx, record in enumerate(records):
+        if isinstance(record, dict):
+            values[row_idx] = [lookup[col_idx].get(scoring.normalize_value(record[col]), -1)
+                               for col_idx, col in enumerate(header)]
+        elif not isinstance(record, list):
+            raise TypeError("Record {} is not an object or a list of codes".format(row_idx))
+        elif len(record) == len(header):
+            codes = [int(code) for code in record]
+            if not all(CODE_RANGE.min <= code <= CODE_RANGE.max for code in codes):
+                raise ValueError("Record {} has codes out of range".format(row_idx))
+            values[row_idx] = codes
+        else:
+            raise ValueError("Record {} has {} values, {} expected".format(row_idx, len(record), len(header)))
+    return values
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """
+    POST /predict {"records": [...]} -> {"results": [{"Naive Bayes": true, ..., "Judge": true}, ...]}
+    GET /stats -> latency and batch size statistics
+    """
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.server.batcher.stats())
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            records = json.loads(self.rfile.read(length).decode('utf-8'))['records']
+            values = encode_request(records, self.server.header, self.server.lookup)
+        except (ValueError, KeyError, TypeError, OverflowError) as error:
+            self.send_json(400, {'error': str(error)})
+            return
+        if not len(values):
+            self.send_json(200, {'results': []})
+            return
+
+        results, verdicts = self.server.batcher.predict(values)
+        response = []
+        for row_idx in range(len(values)):
+            single_result = {name: bool(result == 1)
+                             for name, result in zip(scoring.RESULT_COLUMNS, results[row_idx])}
+            single_result['Judge'] = bool(verdicts[row_idx])
+            response.append(single_result)
+        self.send_json(200, {'results': response})
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep the console quiet, statistics are available on /stats
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server with a listen backlog large enough for bursts of concurrent clients
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(trained, host=DEFAULT_HOST, port=DEFAULT_PORT, window=DEFAULT_WINDOW, max_batch=DEFAULT_MAX_BATCH,
+                  table=None):
+    """
+    :param trained: trained ensemble (see training.load_ensemble)
+    :param host: string - localhost by default
+    :param port: int
+    :param window: micro-batching window in seconds
+    :param max_batch: max records of a batch
+    :param table: see MicroBatcher
+    :return: PredictionServer, to run with serve_forever()
+    """
+    server = PredictionServer((host, port), PredictionHandler)
+    server.header = trained['header']
+    server.lookup = scoring.build_lookup(trained['total_values'], trained['header'])
+    server.batcher = MicroBatcher(trained, window, max_batch, table)
+    return server
@@ -0,0 +1,141 @@
+import collections
+
+import numpy as np
+
+from src import instrumentation
+from src import scoring
+from src.defaults import DEFAULT_MAX_TABLE_SIZE     # records of the input space precomputed at most
+from src.ensemble import Ensemble
+
+DEFAULT_MEMO_SIZE = 1 << 16         # records remembered by the fallback memo
+TABLE_BLOCK_SIZE = 1 << 16          # records of the input space predicted together while building the table
+
+
+class PredictionTable:
+    """
+    Precomputed predictions of a trained ensemble.
+
+    When the input space (the product of the number of codes of each attribute) has at most max_size records,
+    every possible record is predicted once after training: the result of each classifier and the judge verdict
+    are stored in a dense array indexed by the mixed-radix code of the record
+    (index = sum of code * stride, where the stride of an attribute is the product of the domains after it).
+    A prediction is then a single lookup.
+
+    Larger spaces fall back to an LRU memo of the last memo_size distinct records seen.
+    Records with codes never seen in training (-1) are always predicted by the classifiers.
+    """
+
+    def __init__(self, trained, ensemble=None, max_size=DEFAULT_MAX_TABLE_SIZE, memo_size=DEFAULT_MEMO_SIZE):
+        """
+        :param trained: trained ensemble (see training.load_ensemble)
+        :param ensemble: Ensemble giving the judge verdict - default: unit weights
+        :param max_size: max records of the input space for the dense table
+        :param memo_size: max records of the memo
+        """
+        self.trained = trained
+        self.ensemble = ensemble if ensemble is not None else Ensemble.from_trained(trained)
+        self.domains = np.array([len(trained['total_values'][col]) for col in trained['header']], dtype=np.int64)
+        self.size = int(np.prod(self.domains, dtype=object))
+        self.memo_size = memo_size
+        self.memo = collections.OrderedDict()    # record tuple -> row of results and verdict
+        self.hits = 0
+        self.misses = 0
+
+        self.table = None
+        self.strides = None
+        if self.size <= max_size:
+            # stride of an attribute: product of the domains of the attributes after it
+            self.strides = np.ones(len(self.domains), dtype=np.int64)
+            for idx in range(len(self.domains) - 2, -1, -1):
+                self.strides[idx] = self.strides[idx + 1] * self.domains[idx + 1]
+            with instrumentation.stage('lookup.build'):
+                self.table = self.build()
+
+    @property
+    def mode(self):
+        return 'table' if self.table is not None else 'memo'
+
+    def compute(self, values):
+        """
+        :param values: encoded records - 2D array
+        :return: int8 matrix records x (classifiers + judge)
+        """
+        results = scoring.predict_members(self.trained, values)
+        return np.column_stack([results, self.ensemble.vote(results)]).astype(np.int8)
+
+    def build(self):
+        """
+        :return: int8 matrix (size x (classifiers + judge)) with the results of every record of the input space
+        """
+        table = np.empty((self.size, len(scoring.RESULT_COLUMNS)), dtype=np.int8)
+        for start in range(0, self.size, TABLE_BLOCK_SIZE):
+            indexes = np.arange(start, min(start + TABLE_BLOCK_SIZE, self.size))
+            values = np.column_stack(np.unravel_index(indexes, self.domains))
+            table[start:start + len(indexes)] = self.compute(values)
+        return table
+
+    def predict(self, values):
+        """
+        :param values: encoded records - 2D array
+        :return:
+        - results: matrix records x classifiers of 1 or 0 (see scoring.predict_members)
+        - verdicts: judge result of each record
+        """
+        values = np.asarray(values, dtype=np.int64).reshape(-1, len(self.domains))
+        rows = np.empty((len(values), len(scoring.RESULT_COLUMNS)), dtype=np.int8)
+        known = ((values >= 0) & (values < self.domains)).all(axis=1)
+
+        if self.table is not None:
+            rows[known] = self.table[values[known] @ self.strides]
+            self.hits += int(np.count_nonzero(known))
+        else:
+            known_indexes = np.flatnonzero(known)
+            self.lookup_memo(values, known_indexes, rows)
+
+        unknown = ~known
+        if unknown.any():
+            self.misses += int(np.count_nonzero(unknown))
+            rows[unknown] = self.compute(values[unknown])
+
+        return rows[:, :-1], rows[:, -1]
+
+    def lookup_memo(self, values, indexes, rows):
+        """
+        Fill rows of the records in indexes from the memo. Records repeated in the block are looked up once
+        (a miss the first time, then hits); records not in the memo are predicted together and remembered,
+        evicting the least recently used ones
+        :param values: encoded records - 2D array
+        :param indexes: indexes of the records to fill
+        :param rows: result matrix, updated in place
+        """
+        if not len(indexes):
+            return
+        records, inverse = np.unique(values[indexes], axis=0, return_inverse=True)
+        record_rows = np.empty((len(records), rows.shape[1]), dtype=rows.dtype)
+        keys = [tuple(record) for record in records.tolist()]
+        missing = []    # positions in records
+        for position, key in enumerate(keys):
+            row = self.memo.get(key)
+            if row is None:
+                missing.append(position)
+                continue
+            self.memo.move_to_end(key)
+            record_rows[position] = row
+
+        if missing:
+            computed = self.compute(records[missing])
+            for position, row in zip(missing, computed):
+                record_rows[position] = row
+                self.memo[keys[position]] = row.copy()
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+        rows[indexes] = record_rows[inverse.reshape(-1)]
+        self.hits += len(indexes) - len(missing)
+        self.misses += len(missing)
+
+    def stats(self):
+        """
+        :return: dictionary with mode ('table' or 'memo'), size of the input space, hits and misses
+        """
+        return {'mode': self.mode, 'input_space': self.size, 'memo_records': len(self.memo),
+                'hits': self.hits, 'misses': self.misses}
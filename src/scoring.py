@@ -0,0 +1,135 @@
+import csv
+
+import numpy as np
+
+from src import instrumentation
+from src.ensemble import Ensemble
+from src import support_functions
+
+# columns added to the scored records
+RESULT_COLUMNS = ['Naive Bayes', 'Candidate Elimination', 'Support Vector', 'Judge']
+
+
+def judge(results):
+    """
+    The judge decides to majority the final result
+    :param results: results of the classifiers (1 or 0) - list for a single record, or matrix records x classifiers
+    :return: 1 if true values are more than false values, 0 otherwise (an array for a matrix)
+    """
+    results = np.asarray(results)
+    true_values = np.count_nonzero(results == 1, axis=-1)
+    false_values = np.count_nonzero(results == 0, axis=-1)
+    return (true_values > false_values).astype(int)
+
+
+def predict_members(trained, data):
+    """
+    :param trained: trained ensemble (see training.load_ensemble)
+    :param data: encoded records - 2D array
+    :return: matrix records x classifiers (Naive Bayes, Candidate Elimination, Support Vector) of 1 or 0
+    """
+    instrumentation.count('predict.records', len(data))
+    with instrumentation.stage('predict.nb'):
+        nb_predictions = trained['nb'].prediction(data)
+    with instrumentation.stage('predict.ce'):
+        ce_predictions = trained['ce'].batch_prediction(data)
+    with instrumentation.stage('predict.sv'):
+        sv_predictions = trained['sv'].prediction(data)
+    return np.column_stack([nb_predictions, ce_predictions, sv_predictions])
+
+
+def normalize_value(value):
+    """
+    Common form of a cell value, so CSV strings and Excel numbers of the same value are equal
+    :param value: cell value - example 1980.0 or '1980'
+    :return: string - example '1980'
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def build_lookup(total_values, header):
+    """
+    :param total_values: code tables of the data training
+    :param header: attributes names - list
+    :return: list with a dict {normalized value: code} for each attribute
+    """
+    return [{normalize_value(value): code for value, code in total_values[col].items()} for col in header]
+
+
+def encode_records(rows, positions, lookup):
+    """
+    Encode unlabelled records with the code tables of the data training.
+    Values never seen in training get code -1.
+    :param rows: list of lists - raw records
+    :param positions: index of each training attribute in the rows
+    :param lookup: see build_lookup
+    :return:
+    - values: integer matrix (records x attributes)
+    - unknown: number of values never seen in training
+    """
+    values = np.empty((len(rows), len(positions)), dtype=np.int32)
+    unknown = 0
+    for col_idx, position in enumerate(positions):
+        table = lookup[col_idx]
+        for row_idx, row in enumerate(rows):
+            code = table.get(normalize_value(row[position]), -1)
+            unknown += code == -1
+            values[row_idx, col_idx] = code
+    return values, unknown
+
+
+def score_file(trained, input_path, output_path, block_size=support_functions.DEFAULT_BLOCK_SIZE, ensemble=None,
+               judge_only=False, table=None):
+    """
+    Score a file of unlabelled records (CSV or Excel, with a header row) and write them to a CSV file together
+    with the result of each classifier and of the judge. Records are read, scored and written one block at a time.
+    :param trained: trained ensemble (see training.load_ensemble)
+    :param input_path: records to score - string
+    :param output_path: CSV file - string
+    :param block_size: number of records scored together
+    :param ensemble: Ensemble judging the results - default: unit weights
+    :param judge_only: write only the judge result, so members are skipped once the verdict is decided
+    :param table: PredictionTable serving the results of the classifiers and of the judge (its judge is used)
+    :return:
+    - num_records: number of records scored
+    - unknown: number of values never seen in training
+    """
+    if ensemble is None:
+        ensemble = Ensemble.from_trained(trained)
+    header = trained['header']
+    lookup = build_lookup(trained['total_values'], header)
+
+    rows = support_functions.iter_rows(input_path)
+    columns = next(rows)
+    missing = [col for col in header if col not in columns]
+    if missing:
+        raise ValueError("Missing attributes in {}: {}".format(input_path, ", ".join(missing)))
+    positions = [columns.index(col) for col in header]
+
+    num_records = 0
+    unknown = 0
+    with open(output_path, 'w', newline='') as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(list(columns) + (RESULT_COLUMNS[-1:] if judge_only else RESULT_COLUMNS))
+        for block in support_functions.iter_blocks(rows, block_size):
+            values, block_unknown = encode_records(block, positions, lookup)
+            if table is not None:
+                results, verdicts = table.predict(values)
+            elif judge_only:
+                verdicts = ensemble.predict(values)
+            else:
+                results = predict_members(trained, values)
+                verdicts = ensemble.vote(results)
+            if judge_only:
+                for row_idx, row in enumerate(block):
+                    writer.writerow(list(row) + [bool(verdicts[row_idx])])
+            else:
+                for row_idx, row in enumerate(block):
+                    writer.writerow(list(row) + [bool(result == 1) for result in results[row_idx]] +
+                                    [bool(verdicts[row_idx])])
+            num_records += len(block)
+            unknown += block_unknown
+
+    return num_records, unknown
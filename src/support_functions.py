@@ -1,7 +1,12 @@
-import xlrd
-import xlsxwriter
+import csv
 
+import numpy as np
 
+from src import instrumentation
+from src.defaults import DEFAULT_BLOCK_SIZE     # number of rows encoded together by the streaming reader
+
+
+@instrumentation.timed('read_data')
 def read_data(path):
     """
     Read data from Excel file that user chose
@@ -12,16 +17,13 @@ def read_data(path):
     """
 
     values = []
-    workbook = xlrd.open_workbook(path)
-    sheet = workbook.sheet_by_index(0)
-
-    header = sheet.row_values(0)
+    rows = iter_rows(path)
+    header = next(rows)
 
-    for row_idx in range(1, sheet.nrows):
-        row = sheet.row_values(row_idx)
+    for row in rows:
         instance = {}
-        for col_idx in range(0, sheet.ncols):
-            if col_idx == sheet.ncols - 1:
+        for col_idx in range(0, len(header)):
+            if col_idx == len(header) - 1:
                 instance['result'] = row[col_idx]
             else:
                 instance[header[col_idx]] = row[col_idx]
@@ -30,6 +32,115 @@ def read_data(path):
     return values, header[:-1]
 
 
+def iter_rows(path):
+    """
+    Lazily read the rows of a training file; the first row yielded is the header.
+    CSV files are read line by line, Excel files (.xls/.xlsx) row by row from the first sheet.
+    :param path: string
+    :return: generator of lists - example ['Color', 'Size', 'result'], ['YELLOW', 'SMALL', 'True'], ...
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='') as csv_file:
+            for row in csv.reader(csv_file):
+                if row:
+                    yield row
+        return
+
+    import xlrd
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        for row_idx in range(sheet.nrows):
+            yield sheet.row_values(row_idx)
+    finally:
+        workbook.release_resources()
+
+
+def iter_blocks(rows, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Group rows in lists of block_size rows (the last one can be shorter)
+    :param rows: iterable of rows
+    :param block_size: int
+    :return: generator of lists of rows
+    """
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) == block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def encode_rows(rows, header, code_tables):
+    """
+    Encode a block of raw rows (attributes in header order, result as last column).
+    New values are added to code_tables with the same running counter of encode_data.
+    :param rows: list of lists
+    :param header: attributes names - list
+    :param code_tables: dictionary of code tables, updated in place
+    :return:
+    - values: integer matrix (records x attributes)
+    - results: integer array with the final results
+    """
+    values = np.empty((len(rows), len(header)), dtype=np.int32)
+    results = np.empty(len(rows), dtype=np.int32)
+    for col_idx, key in enumerate(header + ['result']):
+        table = code_tables.setdefault(key, {})
+        column = results if key == 'result' else values[:, col_idx]
+        for row_idx, row in enumerate(rows):
+            value = row[col_idx]
+            code = table.get(value)
+            if code is None:
+                code = table[value] = len(table)
+            column[row_idx] = code
+
+    return values, results
+
+
+def encode_blocks(rows, header, code_tables, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Encode rows one block at a time; the time spent reading the rows of each block from the file and encoding
+    them is recorded as stages 'parse' and 'encode' (one call for each block)
+    :param rows: iterable of raw rows, without the header
+    :param header: attributes names - list
+    :param code_tables: dictionary of code tables, updated in place
+    :param block_size: number of rows for each block
+    :return: generator of (values, results) as returned by encode_rows
+    """
+    blocks = iter_blocks(rows, block_size)
+    while True:
+        with instrumentation.stage('parse'):
+            block = next(blocks, None)
+        if block is None:
+            return
+        with instrumentation.stage('encode'):
+            encoded = encode_rows(block, header, code_tables)
+        yield encoded
+
+
+def stream_data(path, block_size=DEFAULT_BLOCK_SIZE, code_tables=None):
+    """
+    Read and encode a training file one block at a time, without building the list of dicts of read_data.
+    :param path: string
+    :param block_size: number of rows for each block
+    :param code_tables: code tables to extend (for example the ones of a training file) - dict
+    :return:
+    - header: a list with the first row of the file (without last column)
+    - code_tables: dictionary of code tables, complete once all blocks are consumed
+    - blocks: generator of (values, results) as returned by encode_rows (see encode_blocks)
+    """
+    rows = iter_rows(path)
+    with instrumentation.stage('parse'):
+        # opens the file (Excel files are loaded here)
+        header = next(rows)[:-1]
+    if code_tables is None:
+        code_tables = {'result': {'True': 1, 'False': 0}}
+
+    return header, code_tables, encode_blocks(rows, header, code_tables, block_size)
+
+
 def prepare_data(data, header):
     """
     :param data: list of dictionaries; keys are attributes and values represent the binary form of real values
@@ -55,6 +166,53 @@ def prepare_data(data, header):
     return values_list, results_list
 
 
+def encode_data(data, header):
+    """
+    Columnar version of convert_data: every column is read once and each new value gets the next code of a
+    running counter. The records of 'data' are not modified.
+    :param data: list of dictionaries as returned by read_data
+                example: [
+                            {'result': 'True', 'Age': 'ADULT', 'Size': 'SMALL'},
+                            {'result': 'False', 'Age': 'CHILD', 'Size': 'SMALL'}
+                          ]
+    :param header: the first row of Excel file (without last column) - list
+    :return:
+    - values: integer matrix (records x attributes, ordered by header) - example [[0, 0], [1, 0]]
+    - results: integer array with the final results (1 or 0)
+    - code_tables: dictionary that contains as keys the attributes and as values a dict with
+                   possible values for attribute (the 'total_values' of convert_data)
+    """
+    values = np.empty((len(data), len(header)), dtype=np.int32)
+    results = np.empty(len(data), dtype=np.int32)
+    code_tables = {'result': encode_column(data, 'result', results, {'True': 1, 'False': 0})}
+    for col_idx, key in enumerate(header):
+        column = np.empty(len(data), dtype=np.int32)
+        code_tables[key] = encode_column(data, key, column)
+        values[:, col_idx] = column
+
+    return values, results, code_tables
+
+
+def encode_column(data, key, column, table=None):
+    """
+    Encode a single column
+    :param data: list of dictionaries
+    :param key: column name
+    :param column: integer array filled with the codes
+    :param table: initial code table - dict
+    :return: code table of the column - example {'blue': 0, 'red': 1}
+    """
+    table = {} if table is None else dict(table)
+    for row_idx, instance in enumerate(data):
+        value = instance[key]
+        code = table.get(value)
+        if code is None:
+            code = table[value] = len(table)
+        column[row_idx] = code
+    return table
+
+
+@instrumentation.timed('convert_data')
 def convert_data(data):
     """
     For each column of Excel file, converts data from strings to binary values in this way:
@@ -70,32 +228,44 @@ def convert_data(data):
     -+-      0      -+-      0      -+-
     -+-      1      -+-      1      -+-
     -+-      1      -+-      0      -+-
-    :param data: list of dictionaries; keys are attributes and values represent the binary form of real values
+    :param data: list of dictionaries; keys are attributes and values represent the real values
                 example: [
-                            {'result': 1, 'Age': 0, 'Size': 0, 'Color': 0, 'Act': 0},
-                            {'result': 0, 'Age': 1, 'Size': 0, 'Color': 0, 'Act': 0}
+                            {'result': 'True', 'Age': 'ADULT', 'Size': 'SMALL'},
+                            {'result': 'False', 'Age': 'CHILD', 'Size': 'SMALL'}
                           ]
     :return:
-    - data: Excel data convert to binary form
+    - data: Excel data convert to binary form - new list of dictionaries, the input is not modified
     - tmp_dict: dictionary that contains as keys the attributes and as values a dict with
                 possible values for attribute
     """
 
-    tmp_dict = {'result': {'True': 1, 'False': 0}}
-    for instance in data:
-        for key, value in instance.items():
-            if key not in tmp_dict:
-                tmp_dict[key] = {}
-            if tmp_dict[key] == {}:
-                tmp_dict[key][value] = 0
-            elif value in tmp_dict[key]:
-                pass
-            else:
-                max_value = max(tmp_dict[key], key=tmp_dict[key].get)
-                tmp_dict[key][value] = tmp_dict[key][max_value] + 1
-            instance[key] = tmp_dict[key][value]
+    if not data:
+        return [], {'result': {'True': 1, 'False': 0}}
+
+    header = [key for key in data[0] if key != 'result']
+    values, results, tmp_dict = encode_data(data, header)
+    binary_data = []
+    for row_idx, row in enumerate(values.tolist()):
+        instance = dict(zip(header, row))
+        instance['result'] = int(results[row_idx])
+        binary_data.append(instance)
+
+    return binary_data, tmp_dict
+
 
-    return data, tmp_dict
+def calc_confusion(results, predictions):
+    """
+    Count true/false positives and negatives with array operations
+    :param results: real results - list or array of 1 or 0
+    :param predictions: predicted results - list or array of 1 or 0
+    :return: dictionary with keys tn, fp, fn, tp
+    """
+    actual = np.asarray(results) == 1
+    predicted = np.asarray(predictions) == 1
+    return {'tn': int(np.count_nonzero(~actual & ~predicted)),
+            'fp': int(np.count_nonzero(~actual & predicted)),
+            'fn': int(np.count_nonzero(actual & ~predicted)),
+            'tp': int(np.count_nonzero(actual & predicted))}
 
 
 def calc_performance(binary_data, header, nb, ce, sv):
@@ -106,6 +276,21 @@ def calc_performance(binary_data, header, nb, ce, sv):
     :param nb: Naive Bayes object
     :param ce: Candidate Elimination object
     :param sv: Support Vector Object
+    :return: confusion_matrix (see calc_confusion_matrix)
+    """
+    data, results = prepare_data(binary_data, header)
+    return calc_confusion_matrix(data, results, nb, ce, sv)
+
+
+def calc_confusion_matrix(data, results, nb, ce, sv):
+    """
+    Calculate confusion matrix.
+    Each classifier predicts the whole data set with a single call.
+    :param data: encoded records - list of list or 2D array
+    :param results: real results - list or array of 1 or 0
+    :param nb: Naive Bayes object
+    :param ce: Candidate Elimination object
+    :param sv: Support Vector Object
     :return:
     - confusion_matrix: a dictionary that contains for each classifier the following attributes:
     tn: True  - negative
@@ -113,54 +298,65 @@ def calc_performance(binary_data, header, nb, ce, sv):
     fn: False - negative
     tp: True  - positive
     """
-    confusion_matrix = {'nb': {'tn': 0, 'fp': 0, 'fn': 0, 'tp': 0},
-                        'ce': {'tn': 0, 'fp': 0, 'fn': 0, 'tp': 0},
-                        'sv': {'tn': 0, 'fp': 0, 'fn': 0, 'tp': 0}
+    instrumentation.count('predict.records', len(data))
+    with instrumentation.stage('predict.nb'):
+        nb_predictions = nb.prediction(data)
+    with instrumentation.stage('predict.ce'):
+        ce_predictions = ce.batch_prediction(data)
+    with instrumentation.stage('predict.sv'):
+        sv_predictions = sv.prediction(data)
+
+    confusion_matrix = {'nb': calc_confusion(results, nb_predictions),
+                        'ce': calc_confusion(results, ce_predictions),
+                        'sv': calc_confusion(results, sv_predictions)
                         }
 
-    for d in binary_data:
-        single_record = [[]]
-        for i in header:
-            result = d['result']
-            single_record[0].append(d[i])
+    return confusion_matrix
 
-        nb_result = nb.prediction(single_record)[0]
-        if result == 1:
-            if nb_result == 1:
-                confusion_matrix['nb']['tp'] += 1
-            else:
-                confusion_matrix['nb']['fn'] += 1
-        else:
-            if nb_result == 1:
-                confusion_matrix['nb']['fp'] += 1
-            else:
-                confusion_matrix['nb']['tn'] += 1
 
-        ce_result = ce.prediction(single_record)
-        if result == 1:
-            if ce_result == 1:
-                confusion_matrix['ce']['tp'] += 1
-            else:
-                confusion_matrix['ce']['fn'] += 1
-        else:
-            if ce_result == 1:
-                confusion_matrix['ce']['fp'] += 1
-            else:
-                confusion_matrix['ce']['tn'] += 1
+def calc_indexes(confusion_matrix):
+    """
+    Calculate the performance indexes of each classifier
+    :param confusion_matrix: see calc_confusion_matrix
+    :return: a list for each classifier (nb, ce, sv) with accuracy, specificity, precision, prevalence and
+             sensitivity, in the format of write_charts
+    """
+    possibilities = ['nb', 'ce', 'sv']
+    full_list = []
+    for possibility in possibilities:
+        single_list = []
+        acc = calc_accuracy(confusion_matrix[possibility]['tn'],
+                            confusion_matrix[possibility]['fp'],
+                            confusion_matrix[possibility]['fn'],
+                            confusion_matrix[possibility]['tp'])
 
-        sv_result = sv.prediction(single_record)[0]
-        if result == 1:
-            if sv_result == 1:
-                confusion_matrix['sv']['tp'] += 1
-            else:
-                confusion_matrix['sv']['fn'] += 1
-        else:
-            if sv_result == 1:
-                confusion_matrix['sv']['fp'] += 1
-            else:
-                confusion_matrix['sv']['tn'] += 1
+        single_list.append(acc)
 
-    return confusion_matrix
+        spec = calc_specificity(confusion_matrix[possibility]['tn'],
+                                confusion_matrix[possibility]['fp'])
+
+        single_list.append(spec)
+
+        prec = calc_precision(confusion_matrix[possibility]['tn'],
+                              confusion_matrix[possibility]['fp'])
+
+        single_list.append(prec)
+
+        prev = calc_prevalence(confusion_matrix[possibility]['tn'],
+                               confusion_matrix[possibility]['fp'],
+                               confusion_matrix[possibility]['fn'],
+                               confusion_matrix[possibility]['tp'])
+
+        single_list.append(prev)
+
+        sens = calc_sensitivity(confusion_matrix[possibility]['tn'],
+                                confusion_matrix[possibility]['fp'])
+
+        single_list.append(sens)
+
+        full_list.append(single_list)
+
+    return full_list
 
 
 def calc_accuracy(tn, fp, fn, tp):
@@ -246,42 +442,65 @@ def calc_prevalence(tn, fp, fn, tp):
         return 0
 
 
-def write_charts(value_list):
+# rows and columns of the performance sheets
+PERFORMANCE_HEADINGS = ['Parameters', 'Naive Bayes', 'Candidate Elimination', 'Support Vector']
+PERFORMANCE_PARAMETERS = ['Accuracy', 'Specificity', 'Precision', 'Prevalence', 'Sensitivity']
+SUMMARY_HEADINGS = ['Data training', 'Records', 'Classifier'] + PERFORMANCE_PARAMETERS + ['Seconds', 'Error']
+
+# characters not allowed in Excel sheet names, and max length of a name
+SHEET_NAME_INVALID = '[]:*?/\\'
+SHEET_NAME_LENGTH = 31
+
+
+@instrumentation.timed('write_charts')
+def write_charts(value_list, path='Performance_recap.xls'):
     """
     Write in an Excel file all performance params and draws a column chart.
-    :param value_list:
+    :param value_list: see calc_indexes
+    :param path: Excel file - string
     """
 
     # init xls file
-    workbook = xlsxwriter.Workbook('Performance_recap.xls')
-    worksheet = workbook.add_worksheet()
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path)
+    write_performance_sheet(workbook, workbook.add_worksheet(), value_list)
+
+    # close file
+    workbook.close()
 
+
+def write_performance_sheet(workbook, worksheet, value_list, title='Results of performance analysis'):
+    """
+    Write the performance params of the three classifiers in a worksheet and draw a column chart.
+    Cells are written row by row, so the sheet can belong to a workbook in constant_memory mode.
+    :param workbook: xlsxwriter Workbook
+    :param worksheet: xlsxwriter Worksheet of workbook
+    :param value_list: see calc_indexes
+    :param title: chart title
+    """
     # set styles and format
     worksheet.set_column(0, 4, 25)
     center_bold = workbook.add_format({'bold': 1, 'align': 'center'})
     center = workbook.add_format({'align': 'center'})
 
-    # prepare list for write Excel file
-    headings = ['Parameters', 'Naive Bayes', 'Candidate Elimination', 'Support Vector']
-    column = ['Accuracy', 'Specificity', 'Precision', 'Prevalence', 'Sensitivity']
-
     # Create a new chart
     chart = workbook.add_chart({'type': 'column'})
 
-    # write row and columns
-    worksheet.write_row('A1', headings, center_bold)
-    worksheet.write_column('A2', column)
-    worksheet.write_column('B2', value_list[0], center)
-    worksheet.write_column('C2', value_list[1], center)
-    worksheet.write_column('D2', value_list[2], center)
+    # write rows: parameter name and value of each classifier
+    worksheet.write_row(0, 0, PERFORMANCE_HEADINGS, center_bold)
+    for row_idx, parameter in enumerate(PERFORMANCE_PARAMETERS):
+        worksheet.write(row_idx + 1, 0, parameter)
+        worksheet.write_row(row_idx + 1, 1, [values[row_idx] for values in value_list], center)
 
     # configure the chart
-    chart.add_series({'name': 'Naive Bayes', 'values': '=Sheet1!$B$2:$B$6', 'categories': '=Sheet1!$A$2:$A$6'})
-    chart.add_series({'name': 'Candidate Elimination', 'values': '=Sheet1!$C$2:$C$6', 'categories': '=Sheet1!$A$2:$A$6'})
-    chart.add_series({'name': 'Support Vector', 'values': '=Sheet1!$D$2:$D$6', 'categories': '=Sheet1!$A$2:$A$6'})
+    last_row = len(PERFORMANCE_PARAMETERS)
+    for col_idx, name in enumerate(PERFORMANCE_HEADINGS[1:]):
+        chart.add_series({'name': name,
+                          'values': [worksheet.name, 1, col_idx + 1, last_row, col_idx + 1],
+                          'categories': [worksheet.name, 1, 0, last_row, 0]})
 
     # set title and axis's names
-    chart.set_title({'name': 'Results of performance analysis'})
+    chart.set_title({'name': title})
     chart.set_x_axis({'name': 'Performance parameters'})
     chart.set_y_axis({'name': 'Values'})
 
@@ -290,5 +509,55 @@ def write_charts(value_list):
     # insert the chart into the worksheet.
     worksheet.insert_chart('A9', chart)
 
-    # close file
+
+def sheet_name(name, used):
+    """
+    :param name: wanted name - example 'data_balloons'
+    :param used: names already in the workbook (lower case), updated with the new one - set
+    :return: a valid and unique Excel sheet name
+    """
+    name = ''.join('_' if char in SHEET_NAME_INVALID else char for char in name).strip("'") or 'Sheet'
+    candidate = name[:SHEET_NAME_LENGTH]
+    counter = 1
+    while candidate.lower() in used:
+        counter += 1
+        suffix = ' ({})'.format(counter)
+        candidate = name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+@instrumentation.timed('write_report')
+def write_report(reports, path='Performance_batch.xlsx'):
+    """
+    Write a workbook with a summary sheet and a sheet with chart for each data training.
+    The workbook is in constant_memory mode: each sheet is flushed to disk row by row.
+    :param reports: list of dictionaries with keys name, records, seconds and either indexes (see calc_indexes)
+                    or error (message of a data training that could not be evaluated)
+    :param path: Excel file - string
+    """
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    used = {'summary'}
+    summary = workbook.add_worksheet('Summary')
+    summary.set_column(0, 0, 30)
+    summary.set_column(1, len(SUMMARY_HEADINGS) - 1, 15)
+    bold = workbook.add_format({'bold': 1})
+    summary.write_row(0, 0, SUMMARY_HEADINGS, bold)
+
+    row_idx = 1
+    for report in reports:
+        if report.get('error'):
+            summary.write_row(row_idx, 0, [report['name'], report.get('records', ''), '', '', '', '', '', '',
+                                           report.get('seconds', ''), report['error']])
+            row_idx += 1
+            continue
+
+        for name, values in zip(PERFORMANCE_HEADINGS[1:], report['indexes']):
+            summary.write_row(row_idx, 0, [report['name'], report['records'], name] + list(values) +
+                              [report['seconds']])
+            row_idx += 1
+        worksheet = workbook.add_worksheet(sheet_name(report['name'], used))
+        write_performance_sheet(workbook, worksheet, report['indexes'], report['name'])
+
     workbook.close()
@@ -1,4 +1,46 @@
-from sklearn import svm
+from src.defaults import DEFAULT_MAX_PASSES
+
+# possible results of the encoded data
+CLASSES = [0, 1]
+
+# step size of the online updates, small enough not to undo the LinearSVC solution
+UPDATE_LEARNING_RATE = 1e-4
+
+# the chunked training stops when the gradient norm falls below this fraction of its initial value
+CHUNKED_TOLERANCE = 1e-6
+
+# sufficient decrease of the objective accepted by the line search of the chunked training
+ARMIJO_FACTOR = 0.01
+
+
+def squared_hinge_pass(make_blocks, weights, c=1.0):
+    """
+    One pass over the row blocks computing the LinearSVC objective (squared hinge loss, L2 penalty on the
+    coefficients and on the intercept, as liblinear) with its gradient and (generalized) Hessian
+    :param make_blocks: function without arguments returning a new iterable of (values, target) at each call
+    :param weights: coefficients followed by the intercept - array
+    :param c: penalty parameter C of LinearSVC
+    :return: (objective, gradient, Hessian, number of records)
+    """
+    import numpy as np
+    objective = 0.5 * weights @ weights
+    gradient = weights.copy()
+    hessian = np.eye(len(weights))
+    num_samples = 0
+    for data, target in make_blocks():
+        if not len(target):
+            continue
+        # a constant column for the intercept, results as -1 and +1
+        records = np.column_stack([np.asarray(data, dtype=np.float64), np.ones(len(target))])
+        signs = np.where(np.asarray(target) == CLASSES[1], 1.0, -1.0)
+        margins = records @ weights
+        violations = 1.0 - signs * margins
+        active = violations > 0
+        objective += c * (violations[active] ** 2).sum()
+        gradient += 2 * c * records[active].T @ (margins[active] - signs[active])
+        hessian += 2 * c * records[active].T @ records[active]
+        num_samples += len(target)
+    return objective, gradient, hessian, num_samples
 
 
 class CalcSupportVector:
@@ -6,10 +48,75 @@ class CalcSupportVector:
     Support Vector Class
     """
     def __init__(self):
+        from sklearn import svm
         self.model = svm.LinearSVC()
+        self.num_samples = 0
 
     def training(self, data, target):
         self.model.fit(data, target)
+        self.num_samples = len(target)
+
+    def training_blocks(self, make_blocks, num_attributes, max_passes=DEFAULT_MAX_PASSES):
+        """
+        Train on row blocks, holding one block in memory at a time. The LinearSVC objective is minimized by Newton
+        steps with a backtracking line search, each pass over the blocks (see squared_hinge_pass) giving the
+        objective, gradient and Hessian at a point: memory depends only on the block size and on the number of
+        attributes, and the model is the one of training up to the tolerance (it converges in a few passes).
+        :param make_blocks: function without arguments returning a new iterable of (values, target) at each call
+        :param num_attributes: number of columns of the values
+        :param max_passes: max passes over the blocks
+        """
+        import numpy as np
+        weights = np.zeros(num_attributes + 1)
+        objective, gradient, hessian, num_samples = squared_hinge_pass(make_blocks, weights)
+        passes = 1
+        initial_norm = np.linalg.norm(gradient)
+        while passes < max_passes and np.linalg.norm(gradient) > CHUNKED_TOLERANCE * initial_norm:
+            step = np.linalg.solve(hessian, -gradient)
+            decrease = ARMIJO_FACTOR * (gradient @ step)
+            size = 1.0
+            while True:
+                result = squared_hinge_pass(make_blocks, weights + size * step)
+                passes += 1
+                if result[0] <= objective + size * decrease or passes >= max_passes:
+                    break
+                size /= 2
+            weights = weights + size * step
+            objective, gradient, hessian, _ = result
+
+        # a LinearSVC with the coefficients found, as after training
+        self.model.coef_ = weights[None, :-1]
+        self.model.intercept_ = weights[-1:]
+        self.model.classes_ = np.array(CLASSES)
+        self.model.n_features_in_ = len(weights) - 1
+        self.model.n_iter_ = passes
+        self.num_samples = num_samples
+
+    def update(self, data, target):
+        """
+        Fold new examples into the trained model.
+        LinearSVC cannot be updated, so the first call replaces it with an SGD linear SVM that minimizes the
+        same squared hinge loss, warm-started from the LinearSVC coefficients; following calls use partial_fit.
+        :param data: list of list - encoded records
+        :param target: list of results
+        """
+        from sklearn.linear_model import SGDClassifier
+        if not isinstance(self.model, SGDClassifier):
+            # same regularization of LinearSVC (C=1) on the samples seen so far
+            online_model = SGDClassifier(loss='squared_hinge', alpha=1.0 / max(1, self.num_samples),
+                                         learning_rate='constant', eta0=UPDATE_LEARNING_RATE)
+            if hasattr(self.model, 'coef_'):
+                # the first partial_fit sets up classes and shapes, then the coefficients are replaced
+                online_model.partial_fit(data[:1], target[:1], classes=CLASSES)
+                online_model.coef_ = self.model.coef_.copy()
+                online_model.intercept_ = self.model.intercept_.copy()
+            self.model = online_model
+
+        if hasattr(self.model, 'classes_'):
+            self.model.partial_fit(data, target)
+        else:
+            self.model.partial_fit(data, target, classes=CLASSES)
+        self.num_samples += len(target)
 
     def prediction(self, data):
         result = self.model.predict(data)
@@ -0,0 +1,160 @@
+import functools
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src import instrumentation
+from src.dataset import Dataset
+from src.naive_bayes import CalcNaiveBayes
+from src.candidate_elimination import CalcCandidateElimination
+from src.support_vector import CalcSupportVector
+
+
+def train_naive_bayes(data, target):
+    nb = CalcNaiveBayes()
+    nb.training(data, target)
+    return nb
+
+
+def train_candidate_elimination(data, target, domains=None):
+    # same boundaries of the file order, with smaller G while training
+    ce = CalcCandidateElimination(data, target, domains=domains, order='positives_first')
+    ce.candidate_elimination()
+    return ce
+
+
+def train_support_vector(data, target):
+    sv = CalcSupportVector()
+    sv.training(data, target)
+    return sv
+
+
+# ensemble members: key, display name, training function
+MEMBERS = [
+    ('nb', 'Naive Bayes', train_naive_bayes),
+    ('ce', 'Candidate Elimination', train_candidate_elimination),
+    ('sv', 'Support Vector', train_support_vector),
+]
+
+# libraries imported by the members when they are first built (the command line tool starts without them)
+MEMBER_LIBRARIES = ('sklearn.naive_bayes', 'sklearn.svm')
+
+
+def import_libraries(names=MEMBER_LIBRARIES):
+    """
+    Import the lazily imported libraries before a measure, so their import time is not billed to the first stage
+    :param names: module names - default: MEMBER_LIBRARIES
+    """
+    for name in names:
+        importlib.import_module(name)
+
+
+def member_functions(domains=None):
+    """
+    :param domains: number of codes of each attribute (see Dataset.domains), given to Candidate Elimination -
+                    default: highest code of each column + 1
+    :return: list of (key, training function) of MEMBERS
+    """
+    functions = []
+    for key, _, train_function in MEMBERS:
+        if key == 'ce' and domains is not None:
+            train_function = functools.partial(train_function, domains=list(domains))
+        functions.append((key, train_function))
+    return functions
+
+
+def timed_training(train_function, data, target, key='', instrumented=False):
+    """
+    :param train_function: one of the training functions of MEMBERS
+    :param data: encoded records
+    :param target: results
+    :param key: member key, used as stage name 'train.<key>'
+    :param instrumented: record instrumentation in this (worker) process and return it
+    :return:
+    - trained classifier
+    - wall time in seconds
+    - instrumentation snapshot when instrumented, None otherwise
+    """
+    if instrumented:
+        instrumentation.reset()
+        instrumentation.enable()
+    import_libraries()
+    start = time.perf_counter()
+    with instrumentation.stage('train.' + key):
+        classifier = train_function(data, target)
+    elapsed = time.perf_counter() - start
+    return classifier, elapsed, instrumentation.snapshot() if instrumented else None
+
+
+def train_members(data, target, workers=None, domains=None):
+    """
+    Train all ensemble members. The members do not depend on each other, so they are fitted concurrently
+    in a process pool (Candidate Elimination is pure Python and would hold the GIL in a thread pool).
+    With a single core, or workers=1, members are trained one after another in this process.
+    :param data: encoded records - list of list or 2D array
+    :param target: results - list or array
+    :param workers: number of processes - default: number of cores
+    :param domains: see member_functions
+    :return:
+    - classifiers: dictionary - example {'nb': CalcNaiveBayes, 'ce': CalcCandidateElimination, 'sv': ...}
+    - timings: dictionary of wall times in seconds - example {'nb': 0.002, 'ce': 0.04, 'sv': 0.01}
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(MEMBERS))
+
+    classifiers = {}
+    timings = {}
+    if workers <= 1:
+        for key, train_function in member_functions(domains):
+            classifiers[key], timings[key], _ = timed_training(train_function, data, target, key)
+        return classifiers, timings
+
+    # measures of the workers are sent back and merged into the ones of this process
+    instrumented = instrumentation.ENABLED
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {key: executor.submit(timed_training, train_function, data, target, key, instrumented)
+                   for key, train_function in member_functions(domains)}
+        for key, future in futures.items():
+            classifiers[key], timings[key], recorded = future.result()
+            if recorded is not None:
+                instrumentation.merge(recorded)
+
+    return classifiers, timings
+
+
+def load_ensemble(path, cache=None, workers=None):
+    """
+    Read (see Dataset.load), encode and train the ensemble on a data training file, or load all of it from the cache
+    :param path: data training file - string
+    :param cache: ModelCache or None
+    :param workers: number of training processes (see train_members)
+    :return: dictionary with keys:
+    - dataset: encoded data training (Dataset)
+    - data, target: values and target of dataset
+    - total_values: code tables of each attribute
+    - header: attributes names
+    - nb, ce, sv: trained classifiers
+    - timings: training wall times of each member, None when loaded from cache
+    """
+    if cache is not None:
+        with instrumentation.stage('cache.load'):
+            trained = cache.load(path)
+        if trained is not None:
+            instrumentation.count('cache.hits')
+            trained['timings'] = None
+            return trained
+
+    dataset = Dataset.load(path)
+    classifiers, timings = train_members(dataset.values, dataset.target, workers, dataset.domains)
+    # data, target, total_values and header are views of the same dataset, pickled only once
+    trained = {'dataset': dataset, 'data': dataset.values, 'target': dataset.target,
+               'total_values': dataset.code_tables, 'header': dataset.header,
+               'nb': classifiers['nb'], 'ce': classifiers['ce'], 'sv': classifiers['sv']}
+    if cache is not None:
+        with instrumentation.stage('cache.store'):
+            cache.store(path, trained)
+
+    trained['timings'] = timings
+    return trained
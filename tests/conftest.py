@@ -0,0 +1,22 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# tests import the modules of the repository as 'src.<module>', like ensemble_learning.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'data')
+
+
+@pytest.fixture(scope='session')
+def trained(tmp_path_factory):
+    """
+    Ensemble trained on a copy of data_balloons, so the encoded cache is not written beside the bundled file
+    """
+    from src import training
+
+    path = str(tmp_path_factory.mktemp('data') / 'data_balloons.xls')
+    shutil.copy(os.path.join(DATA_DIR, 'data_balloons.xls'), path)
+    return training.load_ensemble(path, workers=1)
@@ -0,0 +1,166 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from src.candidate_elimination import COLLAPSED, CONSISTENT, EXHAUSTED, TRAINING_ORDERS, CalcCandidateElimination
+from src.dataset import Dataset
+
+
+def random_examples(rng, num_attributes, cardinality, num_records):
+    data = [[rng.randrange(cardinality) for _ in range(num_attributes)] for _ in range(num_records)]
+    target = [rng.randrange(2) for _ in range(num_records)]
+    return data, target
+
+
+@pytest.mark.parametrize('boundary_prediction', [False, True])
+def test_batch_prediction_matches_prediction_with_unknown_values(boundary_prediction):
+    rng = random.Random(2)
+    for _ in range(200):
+        num_attributes = rng.randint(1, 4)
+        cardinality = rng.choice([2, 3])
+        data, target = random_examples(rng, num_attributes, cardinality, rng.randint(1, 8))
+        if rng.random() < 0.5:
+            # negative examples only: S keeps the '*' hypothesis
+            target = [0] * len(target)
+        ce = CalcCandidateElimination(data, target, boundary_prediction=boundary_prediction)
+        ce.candidate_elimination()
+
+        # -1 is the code of values never seen in training, cardinality a code outside the domains
+        records = [[rng.choice([-1, -1, cardinality, rng.randrange(cardinality)]) for _ in range(num_attributes)]
+                   for _ in range(20)]
+        expected = [ce.prediction([record]) for record in records]
+        assert ce.batch_prediction(records).tolist() == expected
+
+
+def all_hypotheses(domains):
+    return itertools.product(*[['?'] + [str(code) for code in range(size)] for size in domains])
+
+
+def covers(hypothesis, record):
+    return all(field == '?' or field == str(code) for field, code in zip(hypothesis, record))
+
+
+def more_general_or_equal(first, second):
+    return all(field == '?' or field == other for field, other in zip(first, second))
+
+
+def brute_force_boundaries(domains, data, target):
+    """
+    :return: (S, G) of the version space enumerated over every conjunctive hypothesis
+    """
+    version_space = [hypothesis for hypothesis in all_hypotheses(domains)
+                     if all(covers(hypothesis, record) == (result == 1) for record, result in zip(data, target))]
+    general = {hypothesis for hypothesis in version_space
+               if not any(other != hypothesis and more_general_or_equal(other, hypothesis) for other in version_space)}
+    specific = {hypothesis for hypothesis in version_space
+                if not any(other != hypothesis and more_general_or_equal(hypothesis, other) for other in version_space)}
+    return specific, general
+
+
+@pytest.mark.parametrize('order', TRAINING_ORDERS)
+@pytest.mark.parametrize('noisy', [False, True])
+def test_boundaries_match_brute_force_version_space(order, noisy):
+    rng = random.Random(1)
+    for _ in range(150):
+        domains = [rng.randint(2, 3) for _ in range(rng.randint(2, 3))]
+        data = [[rng.randrange(size) for size in domains] for _ in range(rng.randint(1, 7))]
+        if noisy:
+            target = [rng.randrange(2) for _ in data]
+        else:
+            concept = [rng.choice(['?'] + [str(code) for code in range(size)]) for size in domains]
+            target = [int(covers(concept, record)) for record in data]
+        if not any(target):
+            # with negative examples only S keeps '*', that the enumerated hypotheses do not include
+            continue
+
+        ce = CalcCandidateElimination(data, target, domains=domains, order=order)
+        ce.candidate_elimination()
+        specific, general = brute_force_boundaries(domains, data, target)
+        if not specific:
+            assert ce.status == COLLAPSED
+            assert not ce.max_specific and not ce.max_general
+        else:
+            assert ce.status == CONSISTENT
+            assert set(ce.max_specific) == specific
+            assert set(ce.max_general) == general
+
+
+def test_update_matches_training_on_all_examples():
+    rng = random.Random(3)
+    for _ in range(100):
+        domains = [rng.randint(2, 3) for _ in range(rng.randint(2, 3))]
+        data = [[rng.randrange(size) for size in domains] for _ in range(rng.randint(2, 8))]
+        target = [rng.randrange(2) for _ in data]
+
+        full = CalcCandidateElimination(data, target, domains=domains)
+        full.candidate_elimination()
+        incremental = CalcCandidateElimination(data[:1], target[:1], domains=domains)
+        incremental.candidate_elimination()
+        incremental.update(data[1:], target[1:])
+        assert set(incremental.max_specific) == set(full.max_specific)
+        assert set(incremental.max_general) == set(full.max_general)
+        assert sorted(incremental.version_space) == sorted(full.version_space)
+
+
+def test_update_without_examples():
+    ce = CalcCandidateElimination([[0, 1], [1, 1]], [1, 0])
+    version_space = ce.candidate_elimination()
+    assert ce.update([], []) == version_space
+    assert ce.update(np.empty((0, 2), dtype=np.int8), np.empty(0, dtype=np.int8)) == version_space
+    assert len(ce.training_values) == 2
+
+
+@pytest.mark.parametrize('num_codes', [127, 128])
+def test_int8_codes_with_128_values(num_codes):
+    # concept a == v5 on a column with num_codes values: 128 codes still fit int8, but 127 + 1 does not
+    records = [{'a': 'v{}'.format(idx), 'b': 'w{}'.format(idx % 3), 'result': 'True' if idx == 5 else 'False'}
+               for idx in range(num_codes)]
+    records.append({'a': 'v5', 'b': 'w1', 'result': 'True'})
+    dataset = Dataset.from_records(records, ['a', 'b'])
+    assert dataset.values.dtype == np.int8
+
+    for domains in (None, dataset.domains):
+        ce = CalcCandidateElimination(dataset.values, dataset.target, domains=domains)
+        ce.candidate_elimination()
+        assert ce.domains == [num_codes, 3]
+        assert ce.status == CONSISTENT
+        assert ce.max_specific == [('5', '?')]
+        assert ce.max_general == [('5', '?')]
+
+
+@pytest.mark.parametrize('beam_score', ['general', 'consistent'])
+def test_beam_recovers_when_dropped_hypotheses_empty_g(beam_score):
+    # noise-free concept a0 == 1 and a1 == 2, negative examples first: G grows before any positive example
+    rng = np.random.RandomState(1)
+    data = rng.randint(0, 4, (200, 5))
+    target = ((data[:, 0] == 1) & (data[:, 1] == 2)).astype(int)
+    order = np.argsort(target[:100], kind='stable')
+    exact = CalcCandidateElimination(data[order], target[order])
+    exact.candidate_elimination()
+    for max_boundary_size in (1, 3, 5):
+        beam = CalcCandidateElimination(data[order], target[order], max_boundary_size=max_boundary_size,
+                                        beam_score=beam_score)
+        beam.candidate_elimination()
+        assert beam.dropped_hypotheses and beam.beam_rebuilds
+        assert beam.status == CONSISTENT
+        assert beam.max_specific == exact.max_specific
+        assert np.array_equal(beam.batch_prediction(data[100:]), exact.batch_prediction(data[100:]))
+
+
+def test_beam_exhausted_keeps_s():
+    # the last example contradicts the first one: no hypothesis is consistent
+    data = [[1, 2, 0], [0, 0, 1], [0, 1, 2], [1, 2, 1], [1, 2, 0]]
+    target = [1, 0, 0, 1, 0]
+    exact = CalcCandidateElimination(data, target)
+    exact.candidate_elimination()
+    assert exact.status == COLLAPSED
+    assert not exact.max_specific
+
+    beam = CalcCandidateElimination(data, target, max_boundary_size=1)
+    beam.candidate_elimination()
+    assert beam.status == EXHAUSTED
+    assert beam.collapsed_at == 4
+    assert beam.max_specific == [('1', '2', '?')]
+    assert beam.max_general == [('1', '?', '?')]
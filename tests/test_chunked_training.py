@@ -0,0 +1,28 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from src import chunked_training
+from src.dataset import Dataset
+from src.naive_bayes import CalcNaiveBayes
+from src.support_vector import CalcSupportVector
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'data')
+DATA_TRAININGS = sorted(glob.glob(os.path.join(DATA_DIR, '*.xls')) + glob.glob(os.path.join(DATA_DIR, '*.xlsx')))
+
+
+def test_bundled_data_trainings():
+    assert len(DATA_TRAININGS) == 4
+
+
+@pytest.mark.parametrize('path', DATA_TRAININGS)
+@pytest.mark.parametrize('block_size', [3, 10000])
+def test_chunked_training_matches_in_memory_training(path, block_size):
+    dataset = Dataset.read(path)
+    chunked = chunked_training.train_file(path, block_size)
+    assert chunked['records'] == len(dataset)
+    for key, classifier in (('nb', CalcNaiveBayes()), ('sv', CalcSupportVector())):
+        classifier.training(dataset.values, dataset.target)
+        assert np.array_equal(chunked[key].prediction(dataset.values), classifier.prediction(dataset.values)), key
@@ -0,0 +1,85 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from src.dataset import ENCODED_MAGIC, ENCODED_SUFFIX, Dataset
+
+ROWS = [['Color', 'Size', 'result'], ['RED', 'SMALL', 'True'], ['BLUE', 'LARGE', 'False'], ['RED', 'LARGE', 'True']]
+
+
+def write_csv(path, rows, mtime_ns=None):
+    with open(path, 'w') as csv_file:
+        csv_file.write(''.join(','.join(row) + '\n' for row in rows))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def cache_info(path):
+    with open(path + ENCODED_SUFFIX, 'rb') as cache_file:
+        cache_file.read(len(ENCODED_MAGIC))
+        header_size, = struct.unpack('<Q', cache_file.read(8))
+        return json.loads(cache_file.read(header_size).decode('utf-8'))
+
+
+def test_load_stores_and_maps_the_cache(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_csv(path, ROWS)
+    assert Dataset.load_encoded(path) is None
+
+    read = Dataset.load(path)
+    assert os.path.exists(path + ENCODED_SUFFIX)
+    cached = Dataset.load_encoded(path)
+    assert cached is not None
+    base = cached.values
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    assert np.array_equal(cached.values, read.values) and np.array_equal(cached.target, read.target)
+    assert (cached.header, cached.code_tables) == (read.header, read.code_tables)
+
+
+def test_cache_is_rebuilt_when_the_content_changes_with_the_same_size(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_csv(path, ROWS, mtime_ns=1000000000)
+    Dataset.load(path)
+
+    changed = [ROWS[0], ['BLUE', 'SMALL', 'True'], ROWS[2], ROWS[3]]
+    write_csv(path, changed, mtime_ns=2000000000)
+    assert Dataset.load_encoded(path) is None
+    dataset = Dataset.load(path)
+    assert dataset.values.tolist() == [[0, 0], [0, 1], [1, 1]]
+    assert cache_info(path)['source_mtime_ns'] == 2000000000
+
+
+def test_cache_is_rebuilt_when_the_size_changes(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_csv(path, ROWS, mtime_ns=1000000000)
+    Dataset.load(path)
+
+    # same mtime: the size alone invalidates the cache
+    write_csv(path, ROWS + [['GREEN', 'SMALL', 'False']], mtime_ns=1000000000)
+    assert Dataset.load_encoded(path) is None
+    assert len(Dataset.load(path)) == 4
+
+
+def test_touched_file_keeps_the_cache(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_csv(path, ROWS, mtime_ns=1000000000)
+    Dataset.load(path)
+
+    os.utime(path, ns=(3000000000, 3000000000))
+    assert Dataset.load_encoded(path) is not None
+    # stored again with the new mtime, so the next load does not hash the file
+    assert cache_info(path)['source_mtime_ns'] == 3000000000
+
+
+def test_bad_cache_is_ignored(tmp_path):
+    path = str(tmp_path / 'data.csv')
+    write_csv(path, ROWS)
+    with open(path + ENCODED_SUFFIX, 'wb') as cache_file:
+        cache_file.write(b'not a cache')
+    assert Dataset.load_encoded(path) is None
+    assert len(Dataset.load(path)) == 3
+    assert Dataset.load_encoded(path) is not None
@@ -0,0 +1,44 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from src import scoring
+from src.ensemble import Ensemble, parse_weights
+
+# every record of the data_balloons input space, and the same records with unknown values (-1)
+RECORDS = np.array(list(itertools.product([0, 1, -1], repeat=4)))
+
+
+@pytest.mark.parametrize('weights', [None, 'nb=1,ce=1,sv=1', 'nb=1,ce=0.5,sv=2', 'nb=3,ce=1,sv=1', 'nb=0,ce=1,sv=1'])
+def test_short_circuit_matches_full_judge(trained, weights):
+    ensemble = Ensemble.from_trained(trained, parse_weights(weights) if weights else None)
+    results = scoring.predict_members(trained, RECORDS)
+    expected = ensemble.vote(results)
+    if weights is None:
+        assert np.array_equal(expected, scoring.judge(results))
+
+    # twice: the second time members are ordered by their measured cost
+    for _ in range(2):
+        verdicts, votes = ensemble.predict(RECORDS, with_votes=True)
+        assert np.array_equal(verdicts, expected)
+        # members skipped by the short-circuit have no votes
+        for column, key in enumerate(ensemble.keys):
+            if key in votes:
+                evaluated = votes[key] >= 0
+                assert np.array_equal(votes[key][evaluated], results[evaluated, column])
+    for record, verdict in zip(RECORDS.tolist(), expected):
+        assert ensemble.decide(record)[0] == verdict
+
+    stats = ensemble.stats()
+    assert stats['decisions'] == 2 * len(RECORDS) + len(RECORDS)
+    assert 0 <= stats['short_circuits'] <= stats['decisions']
+
+
+def test_dominant_weight_decides_alone(trained):
+    ensemble = Ensemble.from_trained(trained, {'sv': 3})
+    ensemble.costs = {'nb': 2.0, 'ce': 3.0, 'sv': 1.0}
+    verdicts, votes = ensemble.predict(RECORDS, with_votes=True)
+    assert list(votes) == ['sv']
+    assert np.array_equal(verdicts, trained['sv'].prediction(RECORDS))
+    assert ensemble.stats()['short_circuits'] == len(RECORDS)
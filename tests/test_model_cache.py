@@ -0,0 +1,69 @@
+import os
+
+from src import model_cache
+from src.model_cache import ModelCache
+
+ENTRY = {'model': list(range(1000))}
+
+
+def write_source(directory, name, content):
+    path = str(directory / name)
+    with open(path, 'w') as source:
+        source.write(content)
+    return path
+
+
+def entries(cache):
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith('.pkl'))
+
+
+def test_entry_is_invalidated_when_the_source_changes(tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'))
+    path = write_source(tmp_path, 'data.csv', 'a,result\n1,True\n')
+    assert cache.load(path) is None
+    cache.store(path, ENTRY)
+    assert cache.load(path) == ENTRY
+
+    write_source(tmp_path, 'data.csv', 'a,result\n2,True\n')
+    assert cache.load(path) is None
+    cache.store(path, {'model': 'new'})
+    assert cache.load(path) == {'model': 'new'}
+    # the entry of the old content is replaced
+    assert len(entries(cache)) == 1
+
+
+def test_entries_of_another_version_are_ignored(tmp_path, monkeypatch):
+    cache = ModelCache(str(tmp_path / 'cache'))
+    path = write_source(tmp_path, 'data.csv', 'a,result\n1,True\n')
+    cache.store(path, ENTRY)
+    monkeypatch.setattr(model_cache, 'CACHE_VERSION', model_cache.CACHE_VERSION + '-next')
+    assert cache.load(path) is None
+
+
+def test_corrupted_entry_is_removed(tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'))
+    path = write_source(tmp_path, 'data.csv', 'a,result\n1,True\n')
+    cache.store(path, ENTRY)
+    entry_path = os.path.join(cache.directory, entries(cache)[0])
+    with open(entry_path, 'wb') as entry_file:
+        entry_file.write(b'not a pickle')
+    assert cache.load(path) is None
+    assert entries(cache) == []
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ModelCache(str(tmp_path / 'cache'))
+    paths = [write_source(tmp_path, name, name) for name in ('first.csv', 'second.csv', 'third.csv')]
+    cache.store(paths[0], ENTRY)
+    cache.store(paths[1], ENTRY)
+    entry_size = os.path.getsize(os.path.join(cache.directory, entries(cache)[0]))
+    names = {path: cache.entry_name(path)[1] for path in paths}
+    for path, mtime in ((paths[0], 1000), (paths[1], 2000)):
+        os.utime(os.path.join(cache.directory, names[path]), (mtime, mtime))
+
+    # loading the first entry makes the second one the least recently used
+    assert cache.load(paths[0]) == ENTRY
+    cache.max_size = 2 * entry_size
+    cache.store(paths[2], ENTRY)
+    assert entries(cache) == sorted([names[paths[0]], names[paths[2]]])
+    assert cache.load(paths[1]) is None
@@ -0,0 +1,104 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from src import prediction_server
+from src import scoring
+
+
+@pytest.fixture
+def server(trained):
+    server = prediction_server.create_server(trained, port=0, window=0.001)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.batcher.close()
+
+
+def post(server, body):
+    """
+    :return: (status, decoded JSON response)
+    """
+    host, port = server.server_address[:2]
+    request = urllib.request.Request('http://{}:{}/predict'.format(host, port),
+                                     data=body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'))
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read().decode('utf-8'))
+
+
+def test_predict_matches_members_and_judge(trained, server):
+    records = [[0, 0, 0, 0], {'Color': 'PURPLE', 'Size': 'LARGE', 'Act': 'DIP', 'Age': 'CHILD'}, [1, 0, 1, -1]]
+    status, content = post(server, {'records': records})
+    assert status == 200
+
+    values = np.array([[0, 0, 0, 0], [1, 1, 1, 1], [1, 0, 1, -1]])
+    results = scoring.predict_members(trained, values)
+    verdicts = scoring.judge(results)
+    assert content['results'] == [dict({name: bool(result) for name, result in zip(scoring.RESULT_COLUMNS, row)},
+                                       Judge=bool(verdict)) for row, verdict in zip(results, verdicts)]
+
+
+@pytest.mark.parametrize('body', [
+    b'not json',
+    {'rows': [[0, 0, 0, 0]]},
+    {'records': 'abcd'},
+    {'records': ['0000']},
+    {'records': [[0, 0, 0]]},
+    {'records': [[0, 0, 0, 2 ** 40]]},
+    {'records': [[0, 0, 0, 1e400]]},
+    {'records': [{'Color': 'PURPLE'}]},
+])
+def test_bad_requests_answer_400(server, body):
+    status, content = post(server, body)
+    assert status == 400
+    assert content['error']
+
+
+def test_empty_request(server):
+    assert post(server, {'records': []}) == (200, {'results': []})
+
+
+def test_concurrent_requests_are_batched(trained):
+    batcher = prediction_server.MicroBatcher(trained, window=0.5)
+    requests = [np.array([[code % 2, code // 2 % 2, code // 4 % 2, 0]]) for code in range(8)]
+    answers = [None] * len(requests)
+
+    def predict(idx):
+        answers[idx] = batcher.predict(requests[idx])
+
+    threads = [threading.Thread(target=predict, args=(idx,)) for idx in range(len(requests))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = batcher.stats()
+    finally:
+        batcher.close()
+
+    assert stats['requests'] == len(requests)
+    assert stats['batches'] < len(requests)
+    for values, (results, verdicts) in zip(requests, answers):
+        expected = scoring.predict_members(trained, values)
+        assert np.array_equal(results, expected)
+        assert np.array_equal(verdicts, scoring.judge(expected))
+
+
+def test_max_batch_closes_the_batch(trained):
+    batcher = prediction_server.MicroBatcher(trained, window=10, max_batch=3)
+    try:
+        for _ in range(2):
+            batcher.predict(np.zeros((3, 4), dtype=np.int32))
+        stats = batcher.stats()
+    finally:
+        batcher.close()
+    assert (stats['requests'], stats['batches'], stats['batch_size_max']) == (2, 2, 3)
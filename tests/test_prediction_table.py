@@ -0,0 +1,46 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from src import scoring
+from src.ensemble import Ensemble
+from src.prediction_table import PredictionTable
+
+# every record of the data_balloons input space, with unknown values (-1) and codes outside the domains (2)
+RECORDS = np.array(list(itertools.product([0, 1, -1, 2], repeat=4)))
+
+
+@pytest.mark.parametrize('max_size', [1 << 20, 1])
+@pytest.mark.parametrize('weights', [None, {'sv': 3}])
+def test_lookup_matches_direct_prediction(trained, max_size, weights):
+    ensemble = Ensemble.from_trained(trained, weights)
+    table = PredictionTable(trained, ensemble, max_size=max_size)
+    assert table.mode == ('table' if max_size > 1 else 'memo')
+    expected = scoring.predict_members(trained, RECORDS)
+
+    # twice: the memo is filled the first time
+    for _ in range(2):
+        results, verdicts = table.predict(RECORDS)
+        assert np.array_equal(results, expected)
+        assert np.array_equal(verdicts, ensemble.vote(expected))
+
+
+def test_memo_counts_repeated_records_once(trained):
+    table = PredictionTable(trained, max_size=1)
+    records = np.array([[0, 1, 0, 1], [1, 1, 0, 0], [0, 1, 0, 1], [0, 1, 0, 1]])
+    table.predict(records)
+    assert (table.stats()['hits'], table.stats()['misses'], table.stats()['memo_records']) == (2, 2, 2)
+    table.predict(records)
+    assert (table.stats()['hits'], table.stats()['misses']) == (6, 2)
+
+
+def test_memo_evicts_least_recently_used(trained):
+    table = PredictionTable(trained, max_size=1, memo_size=2)
+    first, second, third = [0, 0, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]
+    table.predict([first])
+    table.predict([second])
+    table.predict([first])      # second is now the least recently used
+    table.predict([third])
+    assert list(table.memo) == [tuple(first), tuple(third)]
+    assert (table.hits, table.misses) == (1, 3)
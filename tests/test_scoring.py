@@ -0,0 +1,63 @@
+import csv
+
+import numpy as np
+
+from src import scoring
+
+# data_balloons attributes: Color, Size, Act, Age; TEEN, HUGE and GREEN are never seen in training
+RECORDS = [
+    ['Id', 'Age', 'Act', 'Size', 'Color'],
+    ['1', 'ADULT', 'DIP', 'SMALL', 'YELLOW'],
+    ['2', 'CHILD', 'STRETCH', 'LARGE', 'PURPLE'],
+    ['3', 'TEEN', 'STRETCH', 'SMALL', 'YELLOW'],
+    ['4', 'ADULT', 'STRETCH', 'HUGE', 'GREEN'],
+    ['5', 'ADULT', 'STRETCH', 'SMALL', 'PURPLE'],
+]
+
+
+def write_records(path):
+    with open(path, 'w', newline='') as records_file:
+        csv.writer(records_file).writerows(RECORDS)
+
+
+def read_results(path):
+    with open(path, newline='') as results_file:
+        return list(csv.reader(results_file))
+
+
+def test_unknown_values_are_encoded_as_minus_one(trained):
+    lookup = scoring.build_lookup(trained['total_values'], trained['header'])
+    positions = [RECORDS[0].index(col) for col in trained['header']]
+    values, unknown = scoring.encode_records(RECORDS[1:], positions, lookup)
+    assert unknown == 3
+    assert values.tolist() == [[0, 0, 1, 0], [1, 1, 0, 1], [0, 0, 0, -1], [-1, -1, 0, 0], [1, 0, 0, 0]]
+
+
+def test_score_file_writes_member_and_judge_results(trained, tmp_path):
+    input_path, output_path = str(tmp_path / 'records.csv'), str(tmp_path / 'results.csv')
+    write_records(input_path)
+    num_records, unknown = scoring.score_file(trained, input_path, output_path, block_size=2)
+    assert (num_records, unknown) == (5, 3)
+
+    lookup = scoring.build_lookup(trained['total_values'], trained['header'])
+    positions = [RECORDS[0].index(col) for col in trained['header']]
+    values, _ = scoring.encode_records(RECORDS[1:], positions, lookup)
+    results = scoring.predict_members(trained, values)
+    expected = np.column_stack([results, scoring.judge(results)]) == 1
+
+    rows = read_results(output_path)
+    assert rows[0] == RECORDS[0] + scoring.RESULT_COLUMNS
+    for row, record, expected_row in zip(rows[1:], RECORDS[1:], expected):
+        assert row[:len(record)] == record
+        assert row[len(record):] == [str(bool(result)) for result in expected_row]
+
+
+def test_judge_only_writes_the_judge_results(trained, tmp_path):
+    input_path = str(tmp_path / 'records.csv')
+    write_records(input_path)
+    scoring.score_file(trained, input_path, str(tmp_path / 'full.csv'))
+    scoring.score_file(trained, input_path, str(tmp_path / 'judge.csv'), judge_only=True)
+
+    full, judge_only = read_results(str(tmp_path / 'full.csv')), read_results(str(tmp_path / 'judge.csv'))
+    assert judge_only[0] == RECORDS[0] + ['Judge']
+    assert [row[-1] for row in judge_only] == [row[-1] for row in full]